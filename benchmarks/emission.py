@@ -0,0 +1,61 @@
+"""
+Measure cpp_generate on a synthetic module, to check that it scales linearly.
+
+    python benchmarks/emission.py [--functions N] [--repeat N]
+
+The module holds N free functions and a class with N member functions, one
+name in ten being overloaded. It is generated with N / 10 and N entities. No
+libclang is needed.
+"""
+import argparse
+import time
+
+from cppygen.cppclass import CppClass
+from cppygen.cppygen_parser import Parser
+from cppygen.function import Function
+
+
+def parser(count: int) -> Parser:
+    p = Parser()
+    cpp_class = CppClass()
+    cpp_class.set_name("C", ["cppygen"])
+    cpp_class.set_module("cppygen")
+    for n in range(count):
+        name = f"f{n - n % 2 if n % 10 == 1 else n}"
+        function = Function()
+        function.set_name(name, ["cppygen"])
+        function.set_argument_types([("a", "int" if n % 2 else "double")])
+        function.set_return_type("int")
+        function.set_module("cppygen")
+        p._add_function(function)
+        cpp_class.add_member_func(
+            name, None, "int", [("a", "int" if n % 2 else "double")], ""
+        )
+    p._add_cpp_class(cpp_class)
+    return p
+
+
+def measure(count: int, repeat: int) -> float:
+    p = parser(count)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        p.cpp_generate()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    small = measure(args.functions // 10, args.repeat)
+    large = measure(args.functions, args.repeat)
+    print(f"{args.functions // 10:6} functions  {small * 1000:8.1f} ms")
+    print(f"{args.functions:6} functions  {large * 1000:8.1f} ms ({large / small:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
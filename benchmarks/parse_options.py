@@ -0,0 +1,96 @@
+"""
+Compare parse time with parse_options = "none" and "fast".
+
+    python benchmarks/parse_options.py [--functions N]
+
+Parses the sources and headers of example/source_mode in source mode and a
+synthetic header with N inline function definitions whose bodies instantiate
+STL templates in header mode, where "fast" skips the bodies. Set
+CPPYGEN_LIBCLANG_PATH / CPPYGEN_COMPILE_FLAGS as for cppygen.
+"""
+import argparse
+import pathlib
+import tempfile
+import time
+
+from cppygen.cppygen_parser import Parser
+
+EXAMPLE = pathlib.Path(__file__).parent.parent / "example" / "source_mode"
+
+
+def synthetic_corpus(directory: pathlib.Path, functions: int) -> pathlib.Path:
+    source = directory / "corpus.hpp"
+    source.write_text(
+        "#include <algorithm>\n#include <map>\n#include <string>\n#include <vector>\n"
+        "namespace cppygen {\n"
+        + "".join(
+            [
+                f"inline int f{i}(std::vector<int> v) {{\n"
+                f"  std::map<std::string, std::vector<int>> m;\n"
+                f"  std::sort(v.begin(), v.end());\n"
+                f'  m["{i}"] = v;\n'
+                f"  return static_cast<int>(m.size() + v.size());\n"
+                "}\n"
+                for i in range(functions)
+            ]
+        )
+        + "}\n"
+    )
+    return source
+
+
+def measure(
+    files: list[tuple[pathlib.Path, str]], namespace: str, flags, mode, parse_options
+) -> tuple[float, float]:
+    """
+    Best of three (libclang parse time, total time including extraction).
+    """
+    best = (float("inf"), float("inf"))
+    for _ in range(3):
+        parser = Parser(namespace, parse_options=parse_options)
+        parse = 0.0
+        start = time.perf_counter()
+        for filename, lang in files:
+            with open(filename, "r") as f:
+                data = f.read()
+            parse_start = time.perf_counter()
+            tu = parser._get_tu(data, str(filename), flags, lang, mode)
+            parse += time.perf_counter() - parse_start
+            parser.parse_tu(tu, str(filename), lang, mode=mode)
+        best = min(best, (parse, time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=500)
+    args = parser.parse_args()
+
+    example = [(i, "cpp") for i in sorted(EXAMPLE.glob("shell/*.cpp"))] + [
+        (i, "hpp") for i in sorted(EXAMPLE.glob("shell/*.hpp"))
+    ]
+    example_flags = [f"-I{EXAMPLE / 'shell'}"]
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = [(synthetic_corpus(pathlib.Path(directory), args.functions), "hpp")]
+        for name, files, namespace, flags, mode in [
+            ("example/source_mode", example, "Shell", example_flags, "source"),
+            (
+                f"synthetic ({args.functions} functions)",
+                corpus,
+                "cppygen",
+                [],
+                "header",
+            ),
+        ]:
+            none = measure(files, namespace, flags, mode, "none")
+            fast = measure(files, namespace, flags, mode, "fast")
+            print(name)
+            for n, kind in enumerate(["libclang parse", "total"]):
+                print(
+                    f"  {kind:16} none {none[n] * 1000:8.1f} ms"
+                    f"  fast {fast[n] * 1000:8.1f} ms  x{none[n] / fast[n]:.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
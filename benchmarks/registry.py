@@ -0,0 +1,53 @@
+"""
+Measure merging extracted entities into a Parser, which deduplicates them.
+
+    python benchmarks/registry.py [--functions N] [--repeat N]
+
+Builds N functions in N / 10 submodules, each function found twice as when it
+is defined in a header included by two sources, and merges them. No libclang
+is needed.
+"""
+import argparse
+import time
+
+from cppygen.cppygen_parser import Parser
+from cppygen.function import Function
+from cppygen.submodule import Submodule
+
+
+def model(count: int):
+    functions, submodules = [], []
+    for n in range(count):
+        submodule = Submodule()
+        submodule.set_name(f"m{n // 10}")
+        submodule.set_parent(["cppygen"])
+        submodules.append(submodule)
+        function = Function()
+        function.set_name(f"f{n}", ["cppygen", f"m{n // 10}"])
+        function.set_argument_types([("a", "int"), ("b", "const std::string &")])
+        function.set_return_type("int")
+        function.set_module(submodule.cpp_name)
+        functions.append(function)
+    return functions, submodules, []
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--functions", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        first, second = model(args.functions), model(args.functions)
+        p = Parser()
+        start = time.perf_counter()
+        p.merge_model(first)
+        p.merge_model(second)
+        best = min(best, time.perf_counter() - start)
+        assert len(p._functions) == args.functions
+    print(f"merge {2 * args.functions} functions  {best * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Measure the wall time of `cppygen --help` and of a no-op run.
+
+    python benchmarks/startup.py [--repeat N]
+
+The no-op run regenerates example/source_mode in a temporary directory whose
+outputs and cache are already up to date. Set CPPYGEN_LIBCLANG_PATH /
+CPPYGEN_COMPILE_FLAGS as for cppygen.
+"""
+import argparse
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+EXAMPLE = pathlib.Path(__file__).parent.parent / "example" / "source_mode"
+
+
+def measure(command: list[str], cwd: pathlib.Path, repeat: int) -> float:
+    """
+    Best wall time of `repeat` runs of `command`.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=cwd, check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    cppygen = [sys.executable, "-m", "cppygen"]
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = pathlib.Path(directory)
+        shutil.copytree(EXAMPLE / "shell", cwd / "shell")
+        (cwd / "cppygenconfig.toml").write_text(
+            'search_namespace = "Shell"\n'
+            'sources = ["shell/*.cpp"]\n'
+            'headers = ["shell/*.hpp"]\n'
+            'output_dir = "build"\n'
+            'cache_dir = "build/cache"\n'
+            'include_directories = ["shell"]\n'
+        )
+        run = [*cppygen, "--config_file", "cppygenconfig.toml", "--cwd", "."]
+        subprocess.run(run, cwd=cwd, check=True, capture_output=True)
+
+        print(f"cppygen --help  {measure([*cppygen, '--help'], cwd, args.repeat) * 1000:8.1f} ms")
+        print(f"no-op run       {measure(run, cwd, args.repeat) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
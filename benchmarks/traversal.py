@@ -0,0 +1,90 @@
+"""
+Measure the extraction pass of a header mode parse.
+
+    python benchmarks/traversal.py [--classes N] [--namespaces N] [--no-stl]
+
+Parses a synthetic header with N namespaces of N classes and free functions,
+which includes a few STL headers unless --no-stl is given, once. Then times
+Parser.parse_tu on the parsed translation unit and counts the cursors handed
+to the parser by Cursor.get_children / Cursor.find_children. Set
+CPPYGEN_LIBCLANG_PATH / CPPYGEN_COMPILE_FLAGS as for cppygen.
+"""
+import argparse
+import time
+
+from cppygen._clang.cindex import Cursor
+from cppygen.cppygen_parser import Parser
+
+
+STL = ["algorithm", "map", "memory", "string", "vector"]
+
+
+def synthetic_header(namespaces: int, classes: int, stl: bool) -> str:
+    includes = "".join([f"#include <{i}>\n" for i in STL]) if stl else ""
+    return includes + "namespace cppygen {\n" + "".join(
+        [
+            f"namespace ns{n} {{\n"
+            + "".join(
+                [
+                    f"struct C{i} {{\n"
+                    f"  int a{i};\n"
+                    f"  double b{i};\n"
+                    f"  int get{i}(int x, double y);\n"
+                    "};\n"
+                    f"int f{i}(int x, double y);\n"
+                    f"template <typename T> class T{i} {{ T v; }};\n"
+                    for i in range(classes)
+                ]
+            )
+            + "}\n"
+            for n in range(namespaces)
+        ]
+    ) + "}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--namespaces", type=int, default=20)
+    parser.add_argument("--classes", type=int, default=50)
+    parser.add_argument("--no-stl", action="store_true")
+    args = parser.parse_args()
+
+    visited = 0
+    get_children = Cursor.get_children
+    find_children = getattr(Cursor, "find_children", None)
+
+    def counting_get_children(self):
+        nonlocal visited
+        children = list(get_children(self))
+        visited += len(children)
+        return iter(children)
+
+    def counting_find_children(self, *args, **kwargs):
+        nonlocal visited
+        children = find_children(self, *args, **kwargs)
+        visited += len(children)
+        return children
+
+    Cursor.get_children = counting_get_children  # type: ignore
+    if find_children is not None:
+        Cursor.find_children = counting_find_children  # type: ignore
+
+    source = synthetic_header(args.namespaces, args.classes, not args.no_stl)
+    tu = Parser("cppygen")._get_tu(source, "tmp.hpp", lang="hpp")
+    best = float("inf")
+    for _ in range(3):
+        visited = 0
+        parser = Parser("cppygen")
+        start = time.perf_counter()
+        parser.parse_tu(tu, "tmp.hpp", "hpp", mode="header")
+        best = min(best, time.perf_counter() - start)
+
+    stl = "" if args.no_stl else " + STL"
+    print(f"{args.namespaces} namespaces x {args.classes} classes{stl}")
+    print(f"  cursors returned {visited:10d}")
+    print(f"  extraction       {best * 1000:10.1f} ms")
+    print(f"  cursors/sec      {visited / best:10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,16 @@
 import argparse
+import os
 import pathlib
+import sys
+import time
 
-from .logging import get_logger
+from . import __version__
 
-logger = get_logger("cppygen command")
 
-import toml
-
-from cppygen.cppygen_parser import Parser
-
-
-def run():
-    parser = argparse.ArgumentParser()
+def _argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        epilog="Run `cppygen serve --help` for the generation server."
+    )
     parser.add_argument(
         "--config_file", required=True, type=str, help="Path to config file"
     )
@@ -27,9 +26,59 @@ def run():
     parser.add_argument(
         "--flags", required=False, type=str, help="flags for cmake project"
     )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        required=False,
+        type=int,
+        default=1,
+        help="number of parallel parse jobs (source mode only)",
+    )
+    parser.add_argument(
+        "--executor",
+        choices=["process", "thread"],
+        default="process",
+        help="run parse jobs in worker processes or in threads sharing one libclang index",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="regenerate even if no input changed since the last run",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and regenerate whenever an input changes",
+    )
+    parser.add_argument(
+        "--client",
+        action="store_true",
+        help="generate through a running `cppygen serve`, or in-process if none is running",
+    )
+    parser.add_argument(
+        "--socket", type=str, help="socket of `cppygen serve` used with --client"
+    )
     parser.add_argument("--verbose", action="store_true", help="verbose output")
+    return parser
+
+
+def generate(args: argparse.Namespace, tu_cache=None) -> bool:
+    """
+    Generate the bindings described by the command line `args`. A server
+    passes its TuCache to reuse translation units across calls.
+
+    Return False if the outputs were up to date.
+    """
+    # Imported here so that --help does not pay for toml and colorlog, and the
+    # libclang bindings are only loaded once a run is needed.
+    import toml
+
+    from .logging import get_logger
+    from .digest import fingerprint
+    from .stamp import is_up_to_date, write_stamp
 
-    args = parser.parse_args()
+    logger = get_logger("cppygen command")
+    started = time.time_ns()
 
     configs = toml.load(args.config_file)
     cwd = pathlib.Path(args.cwd)
@@ -64,39 +113,162 @@ def run():
         exit(1)
     output_dir = cwd.joinpath(config_output_dir)
 
-    cppygen = Parser(
-        namespace=configs.get("search_namespace"),
-        library_file=configs.get("libclang_path"),
-        verbose=args.verbose,
+    flags = list(configs.get("flags", []))
+
+    for i in configs.get("include_directories", []):
+        flags.append(f"-I{str(cwd.joinpath(i).absolute())}")
+
+    flags.extend([i for i in (args.flags or "").split(";") if i])
+    flags.extend([f"-I{i}" for i in (args.include_directories or "").split(";") if i])
+
+    compilation_database = None
+    if (config_database := configs.get("compilation_database")) is not None:
+        if mode != "source":
+            logger.error("compilation_database is only used in source mode")
+            exit(1)
+        compilation_database = cwd.joinpath(config_database)
+        if compilation_database.name != "compile_commands.json":
+            compilation_database = compilation_database / "compile_commands.json"
+
+    shards = configs.get("shards", 1)
+    outputs = [output_dir.joinpath("cppygen_generated.cpp")]
+    if shards > 1:
+        outputs.extend(
+            [output_dir.joinpath(f"cppygen_generated_{n}.cpp") for n in range(shards)]
+        )
+    generated = [
+        *outputs,
+        output_dir.joinpath("cppygen_generated.hpp"),
+        output_dir.joinpath("cppygen_generated.d"),
+    ]
+    if shards > 1:
+        generated.append(output_dir.joinpath("cppygen_generated.cmake"))
+
+    # Skip the run if neither the settings nor any file read last time changed.
+    stamp_file = output_dir.joinpath("cppygen_generated.stamp")
+    with open(args.config_file, "rb") as f:
+        config = f.read()
+    key = fingerprint(
+        __version__,
+        config,
+        str(cwd.absolute()),
+        [str(i) for i in sources],
+        [str(i) for i in headers],
+        flags,
+        os.environ.get("CPPYGEN_COMPILE_FLAGS"),
+        os.environ.get("CPPYGEN_LIBCLANG_PATH"),
     )
+    if not args.force and is_up_to_date(stamp_file, key):
+        if args.verbose:
+            print("cppygen: outputs are up to date")
+        return False
+
+    from .cppygen_parser import ParseError, Parser
+    from .output import write_depfile, write_if_changed
+
+    cache_dir = None
+    manifest_file = None
+    if (config_cache_dir := configs.get("cache_dir")) is not None:
+        cache_dir = str(cwd.joinpath(config_cache_dir))
+        manifest_file = str(cwd.joinpath(config_cache_dir, "manifest.pickle"))
+
+    directories = None
+    if (config_directories := configs.get("export_directories")) is not None:
+        directories = [str(cwd.joinpath(i)) for i in config_directories]
+
+    try:
+        cppygen = Parser(
+            namespace=configs.get("search_namespace"),
+            library_file=configs.get("libclang_path"),
+            verbose=args.verbose,
+            cache_dir=cache_dir,
+            manifest_file=manifest_file,
+            parse_options=configs.get("parse_options", "fast"),
+            precompiled_headers=configs.get("precompiled_headers", []),
+            tu_cache=tu_cache,
+            skip_system_headers=configs.get("skip_system_headers", True),
+            directories=directories,
+        )
+    except ValueError as e:
+        logger.error(str(e))
+        exit(1)
 
     for i in configs.get("call_guards", []):
         cppygen.add_call_guard(i)
 
-    flags = configs.get("flags", [])
+    file_flags = None
+    if compilation_database is not None:
+        from ._clang.cindex import CompilationDatabaseError
+        from .compilation_database import compile_flags
 
-    for i in configs.get("include_directories", []):
-        flags.append(f"-I{str(cwd.joinpath(i).absolute())}")
-
-    flags.extend([i for i in (args.flags or "").split(";")])
-    flags.extend([f"-I{i}" for i in (args.include_directories or "").split(";")])
+        try:
+            file_flags = compile_flags(compilation_database, sources, flags)
+        except CompilationDatabaseError:
+            logger.error(f"Failed to load {compilation_database}")
+            exit(1)
+        if args.verbose:
+            print(
+                f"cppygen: {len(file_flags)} of {len(sources)} sources found in "
+                f"{compilation_database}, "
+                f"{len({id(i) for i in file_flags.values()})} distinct flag sets"
+            )
 
-    if mode == "source":
-        for i in sources:
-            cppygen.parse_from_file(i, lang="cpp", flags=configs.get("flags", []))
+    parsed_sources, parsed_headers = sources, headers
+    prescan = None
+    if configs.get("prescan", True):
+        from .prescan import Prescan
 
-        for i in headers:
-            cppygen.parse_from_file(i, lang="hpp", flags=configs.get("flags", []))
-    else:
-        with_diagnostic = configs.get("diagnostic", True)
-        cppygen.parse(
-            source="\n".join([f"#include<{i}>" for i in headers]),
-            filename="tmp.hpp",
-            lang="hpp",
-            with_diagnostic=with_diagnostic,
-            flags=flags,
-            mode="header",
+        prescan_flags = [*flags, *os.environ.get("CPPYGEN_COMPILE_FLAGS", "").split()]
+        for i in {id(i): i for i in (file_flags or {}).values()}.values():
+            prescan_flags.extend(i)
+        prescan = Prescan(
+            configs.get("search_namespace") or "cppygen",
+            prescan_flags,
+            configs.get("precompiled_headers", []),
         )
+        kept = {str(i) for i in prescan.filter([*sources, *headers])}
+        parsed_sources = [i for i in sources if str(i) in kept]
+        parsed_headers = [i for i in headers if str(i) in kept]
+        if args.verbose:
+            print(
+                f"cppygen: prescan skipped {len(sources) + len(headers) - len(kept)} "
+                f"of {len(sources) + len(headers)} files"
+            )
+
+    try:
+        if mode == "source":
+            files = [(i, "cpp") for i in parsed_sources]
+            files += [(i, "hpp") for i in parsed_headers]
+            # Worker processes would not see the translation units of a server.
+            threads = args.executor == "thread" or tu_cache is not None
+            if args.jobs > 1 and threads:
+                from cppygen.parallel import parse_files_in_threads
+
+                parse_files_in_threads(cppygen, files, flags, args.jobs, file_flags)
+            elif args.jobs > 1:
+                from cppygen.parallel import parse_files_in_processes
+
+                parse_files_in_processes(cppygen, files, flags, args.jobs, file_flags)
+            else:
+                for i, lang in files:
+                    cppygen.parse_from_file(
+                        i, lang=lang, flags=(file_flags or {}).get(str(i), flags)
+                    )
+        else:
+            with_diagnostic = configs.get("diagnostic", True)
+            cppygen.parse(
+                source="\n".join([f"#include<{i}>" for i in parsed_headers]),
+                filename="tmp.hpp",
+                lang="hpp",
+                with_diagnostic=with_diagnostic,
+                flags=flags,
+                mode="header",
+            )
+    except ParseError as e:
+        for message in e.messages:
+            logger.error(message)
+        logger.error(str(e))
+        exit(1)
 
     if configs.get("include_headers"):
         logger.warning(
@@ -106,11 +278,124 @@ def run():
     for i in headers:
         cppygen.add_hpp_includes(i)
 
-    with open(str(output_dir) + "/cppygen_generated.hpp", "w") as f:
-        f.write(cppygen.hpp_generate())
+    cppygen.save_manifest()
+
+    write_if_changed(
+        output_dir.joinpath("cppygen_generated.hpp"), cppygen.hpp_generate()
+    )
+    if shards > 1:
+        main, shard_sources = cppygen.cpp_generate_shards(
+            shards, configs.get("shard_by", "balanced")
+        )
+        write_if_changed(outputs[0], main)
+        for output, source in zip(outputs[1:], shard_sources):
+            write_if_changed(output, source)
+        write_if_changed(
+            output_dir.joinpath("cppygen_generated.cmake"),
+            "set(CPPYGEN_GENERATED_SOURCES\n"
+            + "".join([f'  "{i.absolute().as_posix()}"\n' for i in outputs])
+            + ")\n",
+        )
+    else:
+        write_if_changed(outputs[0], cppygen.cpp_generate())
+
+    dependencies = [args.config_file, *sources, *headers, *cppygen.get_dependencies()]
+    if compilation_database is not None:
+        dependencies.append(compilation_database)
+    if prescan is not None:
+        # A skipped file is parsed once a file it includes opens the namespace.
+        dependencies.extend(prescan.files)
+    write_depfile(
+        output_dir.joinpath("cppygen_generated.d"),
+        [*outputs, output_dir.joinpath("cppygen_generated.hpp")],
+        dependencies,
+    )
+    write_stamp(stamp_file, key, generated, dependencies, started)
+    return True
+
+
+def _watched_files(args: argparse.Namespace) -> dict[str, int | None]:
+    """
+    Modification time of the config file, the files matching its sources and
+    headers, and the files read by the last successful run.
+    """
+    import toml
+
+    from .stamp import dependencies
+
+    files = [args.config_file]
+    try:
+        configs = toml.load(args.config_file)
+        cwd = pathlib.Path(args.cwd)
+        for i in [*configs.get("sources", []), *configs.get("headers", [])]:
+            files.extend([str(j) for j in cwd.glob(i)])
+        stamp_file = cwd.joinpath(configs["output_dir"], "cppygen_generated.stamp")
+        files.extend(dependencies(stamp_file))
+    except Exception:
+        # Reported by generate.
+        pass
+    mtimes = {}
+    for i in files:
+        try:
+            mtimes[i] = os.stat(i).st_mtime_ns
+        except OSError:
+            mtimes[i] = None
+    return mtimes
+
+
+def watch(args: argparse.Namespace, interval: float = 0.5):
+    """
+    Generate, then generate again whenever one of the watched files changes.
+    Translation units stay in memory between runs, only those whose file or
+    includes changed are reparsed.
+    """
+    from .tu_cache import TuCache
 
-    with open(str(output_dir) + "/cppygen_generated.cpp", "w") as f:
-        f.write(cppygen.cpp_generate())
+    tu_cache = TuCache()
+    print("cppygen: watching for changes, press Ctrl-C to stop", flush=True)
+    previous = None
+    try:
+        while True:
+            if (current := _watched_files(args)) != previous:
+                previous = current
+                try:
+                    if generate(args, tu_cache):
+                        print(f"cppygen: generated at {time.strftime('%X')}")
+                except SystemExit:
+                    # The error was logged, wait for the next change.
+                    pass
+                except Exception as e:
+                    # e.g. a config file saved half-edited or a source removed
+                    # while read.
+                    from .logging import get_logger
+
+                    get_logger("cppygen command").error(f"{type(e).__name__}: {e}")
+                sys.stdout.flush()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def run():
+    if sys.argv[1:2] == ["serve"]:
+        from .server import main
+
+        main(sys.argv[2:])
+        return
+
+    args = _argument_parser().parse_args()
+    if args.client:
+        from .server import default_socket, request
+
+        result = request(args.socket or default_socket(), sys.argv[1:], os.getcwd())
+        if result is not None:
+            status, output = result
+            sys.stdout.write(output)
+            exit(status)
+    if args.watch:
+        watch(args)
+    else:
+        generate(args)
 
 
 if __name__ == "__main__":
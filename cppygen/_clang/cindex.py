@@ -69,6 +69,7 @@ import cppygen._clang.enumerations
 
 import os
 import sys
+import threading
 
 if sys.version_info[0] == 3:
     # Python 3 strings are unicode, translate them to/from utf8 for C-interop.
@@ -301,6 +302,11 @@ class SourceLocation(Structure):
         """Get the file offset represented by this source location."""
         return self._get_instantiation()[3]
 
+    @property
+    def is_in_system_header(self):
+        """Returns true if the given source location is in a system header."""
+        return conf.lib.clang_Location_isInSystemHeader(self)
+
     def __eq__(self, other):
         return conf.lib.clang_equalLocations(self, other)
 
@@ -1570,7 +1576,7 @@ class Cursor(Structure):
 
         return conf.lib.clang_getIncludedFile(self)
 
-    @property
+    @CachedProperty
     def kind(self):
         """Return the kind of this cursor."""
         return CursorKind.from_id(self._kind_id)
@@ -1823,12 +1829,12 @@ class Cursor(Structure):
 
         return self._referenced
 
-    @property
+    @CachedProperty
     def brief_comment(self):
         """Returns the brief comment text associated with that Cursor"""
         return conf.lib.clang_Cursor_getBriefCommentText(self)
 
-    @property
+    @CachedProperty
     def raw_comment(self):
         """Returns the raw comment text associated with that Cursor"""
         return conf.lib.clang_Cursor_getRawCommentText(self)
@@ -1878,6 +1884,47 @@ class Cursor(Structure):
         conf.lib.clang_visitChildren(self, callbacks["cursor_visit"](visitor), children)
         return iter(children)
 
+    def find_children(self, kinds, max_depth=1, skip=None):
+        """Return the descendants of this cursor whose kind is in kinds, in
+        preorder, at most max_depth levels below it (None for no limit).
+
+        Unlike get_children, cursors of other kinds are dropped inside the
+        visitor by comparing the raw kind id, and the spelling of each match
+        is fetched while it is visited.
+
+        skip is an optional predicate called with a descendant which is
+        either of a wanted kind or to be descended into. Descendants for
+        which it returns True are neither returned nor descended into.
+        """
+        ids = frozenset([kind.value for kind in kinds])
+        tu = self._tu
+        found = []
+
+        def visitor(child, parent, depth):
+            if skip is not None and (
+                child._kind_id in ids or max_depth is None or depth < max_depth
+            ):
+                if skip(child):
+                    return 1  # continue
+            if child._kind_id in ids:
+                child._tu = tu
+                child._spelling = conf.lib.clang_getCursorSpelling(child)
+                found.append(child)
+            if max_depth is None:
+                return 2  # recurse
+            if depth < max_depth:
+                conf.lib.clang_visitChildren(child, callback, depth + 1)
+            return 1  # continue
+
+        callback = callbacks["cursor_visit"](visitor)
+        try:
+            conf.lib.clang_visitChildren(self, callback, 1)
+        finally:
+            # visitor refers to callback, break the cycle which would keep
+            # the translation unit alive until the next garbage collection.
+            del callback
+        return found
+
     def walk_preorder(self):
         """Depth-first preorder walk over the cursor and its descendants.
 
@@ -2481,7 +2528,7 @@ class Type(Structure):
             conf.lib.clang.getExceptionSpecificationType(self)
         )
 
-    @property
+    @CachedProperty
     def spelling(self):
         """Retrieve the spelling of this Type."""
         return conf.lib.clang_getTypeSpelling(self)
@@ -2991,6 +3038,14 @@ class TranslationUnit(ClangObject):
 
         return File.from_name(self, filename)
 
+    def get_file_size(self, file):
+        """Return the size of the buffer this translation unit read for
+        `file`, unsaved contents included, or None if it did not read it."""
+        size = c_size_t()
+        if not conf.lib.clang_getFileContents(self, file, byref(size)):
+            return None
+        return size.value
+
     def get_location(self, filename, position):
         """Obtain a SourceLocation for a file in this translation unit.
 
@@ -3077,6 +3132,9 @@ class TranslationUnit(ClangObject):
         as unsaved_files, the first items should be the filenames to be mapped
         and the second should be the contents to be substituted for the
         file. The contents may be passed as strings or file objects.
+
+        Raises TranslationUnitLoadError if reparsing failed, the translation
+        unit is unusable afterwards.
         """
         if unsaved_files is None:
             unsaved_files = []
@@ -3094,6 +3152,8 @@ class TranslationUnit(ClangObject):
         ptr = conf.lib.clang_reparseTranslationUnit(
             self, len(unsaved_files), unsaved_files_array, options
         )
+        if ptr:
+            raise TranslationUnitLoadError("Error reparsing translation unit.")
 
     def save(self, filename):
         """Saves the TranslationUnit to a file.
@@ -3525,6 +3585,7 @@ functionList = [
     ("clang_getCanonicalCursor", [Cursor], Cursor, Cursor.from_cursor_result),
     ("clang_getCanonicalType", [Type], Type, Type.from_result),
     ("clang_getChildDiagnostics", [Diagnostic], c_object_p),
+    ("clang_getClangVersion", [], _CXString, _CXString.from_result),
     ("clang_getCompletionAvailability", [c_void_p], c_int),
     ("clang_getCompletionBriefComment", [c_void_p], _CXString, _CXString.from_result),
     ("clang_getCompletionChunkCompletionString", [c_void_p, c_int], c_object_p),
@@ -3589,6 +3650,7 @@ functionList = [
     ("clang_getEnumConstantDeclValue", [Cursor], c_longlong),
     ("clang_getEnumDeclIntegerType", [Cursor], Type, Type.from_result),
     ("clang_getFile", [TranslationUnit, c_interop_string], c_object_p),
+    ("clang_getFileContents", [TranslationUnit, File, POINTER(c_size_t)], c_void_p),
     ("clang_getFileName", [File], _CXString, _CXString.from_result),
     ("clang_getFileTime", [File], c_uint),
     ("clang_getIBOutletCollectionType", [Cursor], Type, Type.from_result),
@@ -3609,6 +3671,7 @@ functionList = [
     ),
     ("clang_getLocation", [TranslationUnit, File, c_uint, c_uint], SourceLocation),
     ("clang_getLocationForOffset", [TranslationUnit, File, c_uint], SourceLocation),
+    ("clang_Location_isInSystemHeader", [SourceLocation], bool),
     ("clang_getNullCursor", None, Cursor),
     ("clang_getNumArgTypes", [Type], c_uint),
     ("clang_getNumCompletionChunks", [c_void_p], c_int),
@@ -3755,6 +3818,42 @@ def register_functions(lib, ignore_errors):
         register(f)
 
 
+class LazyLibrary(object):
+    """A libclang library instance registering function prototypes lazily.
+
+    The prototype of a function in functionList is registered the first time
+    the function is looked up, so only the functions actually used are
+    registered.
+
+    Functions may first be looked up by several threads at once, e.g. by the
+    parsing threads. Registration is serialized, so that no thread calls a
+    function before its prototype is set.
+    """
+
+    _prototypes = None
+    _lock = threading.Lock()
+
+    def __init__(self, lib, ignore_errors):
+        self._lib = lib
+        self._ignore_errors = ignore_errors
+
+    def __getattr__(self, name):
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        with LazyLibrary._lock:
+            if name in self.__dict__:
+                # Registered by another thread meanwhile.
+                return self.__dict__[name]
+            if LazyLibrary._prototypes is None:
+                LazyLibrary._prototypes = {item[0]: item for item in functionList}
+            item = LazyLibrary._prototypes.get(name)
+            if item is not None:
+                register_function(self._lib, item, self._ignore_errors)
+            func = getattr(self._lib, name)
+            setattr(self, name, func)
+            return func
+
+
 class Config(object):
     library_path = None
     library_file = None
@@ -3811,8 +3910,7 @@ class Config(object):
 
     @CachedProperty
     def lib(self):
-        lib = self.get_cindex_library()
-        register_functions(lib, not Config.compatibility_check)
+        lib = LazyLibrary(self.get_cindex_library(), not Config.compatibility_check)
         Config.loaded = True
         return lib
 
@@ -3849,10 +3947,14 @@ class Config(object):
 
         return library
 
+    def get_clang_version(self):
+        """Return the version string of the loaded libclang."""
+        return self.lib.clang_getClangVersion()
+
     def function_exists(self, name):
         try:
             getattr(self.lib, name)
-        except AttributeError:
+        except (AttributeError, LibclangError):
             return False
 
         return True
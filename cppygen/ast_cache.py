@@ -0,0 +1,136 @@
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+
+from cppygen._clang.cindex import (
+    Index,
+    TranslationUnit,
+    TranslationUnitLoadError,
+    TranslationUnitSaveError,
+    conf,
+)
+
+from .digest import file_digest, file_stat, fingerprint
+from .output import replacing
+
+
+class FileDigests:
+    """
+    Content hashes of files, computed once per version (modification time and
+    size) of each file. Shared by the AST cache and the manifest of a Parser,
+    so that a file is read at most once however many entries include it.
+    """
+
+    def __init__(self):
+        self._digests: dict[str, tuple[tuple[int, int] | None, str | None]] = {}
+
+    def get(self, filename: str) -> str | None:
+        st = file_stat(filename)
+        if st is not None and (entry := self._digests.get(filename)) is not None:
+            if entry[0] == st:
+                return entry[1]
+        digest = file_digest(filename)
+        self._digests[filename] = (st, digest)
+        return digest
+
+
+class AstCache:
+    """
+    Directory of serialized translation units (see TranslationUnit.save).
+
+    An entry is keyed by the source contents, its path, the compile flags and
+    the libclang version. Next to each `<key>.ast` a `<key>.json` records the
+    modification time, size and content hash of every file the translation
+    unit included, so an entry is only used while none of them changed. Files
+    whose modification time and size are unchanged are not hashed again.
+
+    Storing an entry removes the entries of older contents of the same file
+    parsed with the same flags, and the least recently used entries once the
+    directory holds more than `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str | pathlib.Path,
+        digests: FileDigests | None = None,
+        max_size: int = 2 << 30,
+    ):
+        self._directory = pathlib.Path(directory)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        self._digests = digests if digests is not None else FileDigests()
+        self._max_size = max_size
+
+    def key(self, source: str, filename: str, args: list[str]) -> str:
+        """
+        `<slot>.<contents>`: the slot identifies the file and its flags, the
+        second part its contents.
+        """
+        slot = fingerprint(conf.get_clang_version(), os.path.abspath(filename), args)
+        return f"{slot}.{hashlib.sha256(source.encode()).hexdigest()}"
+
+    def load(self, index: Index, key: str) -> TranslationUnit | None:
+        ast_file = self._directory / f"{key}.ast"
+        try:
+            with open(self._directory / f"{key}.json", "r") as f:
+                includes: dict[str, list] = json.load(f)
+            for filename, (mtime, size, digest) in includes.items():
+                if file_stat(filename) != (mtime, size):
+                    if self._digests.get(filename) != digest:
+                        return None
+        except (OSError, ValueError, TypeError):
+            return None
+        try:
+            tu = TranslationUnit.from_ast_file(ast_file, index)
+        except TranslationUnitLoadError:
+            return None
+        # Most recently used entries are evicted last.
+        with contextlib.suppress(OSError):
+            os.utime(ast_file)
+        return tu
+
+    def store(self, tu: TranslationUnit, key: str):
+        includes = {}
+        for i in tu.get_includes():
+            filename = i.include.name
+            if filename not in includes:
+                st = file_stat(filename) or (None, None)
+                includes[filename] = [*st, self._digests.get(filename)]
+
+        try:
+            with replacing(self._directory / f"{key}.ast") as tmp:
+                tu.save(tmp)
+        except TranslationUnitSaveError:
+            return
+        with replacing(self._directory / f"{key}.json") as tmp:
+            tmp.write_text(json.dumps(includes))
+        self._prune(key)
+
+    def _remove(self, key: str):
+        for i in [f"{key}.ast", f"{key}.json"]:
+            with contextlib.suppress(OSError):
+                os.unlink(self._directory / i)
+
+    def _prune(self, key: str):
+        slot = key.split(".")[0]
+        entries = []
+        for ast_file in self._directory.glob("*.ast"):
+            other = ast_file.name[: -len(".ast")]
+            if other == key:
+                continue
+            if other.split(".")[0] == slot:
+                # An older version of the file just stored.
+                self._remove(other)
+                continue
+            with contextlib.suppress(OSError):
+                st = ast_file.stat()
+                entries.append((st.st_mtime_ns, st.st_size, other))
+        size = sum([i[1] for i in entries])
+        with contextlib.suppress(OSError):
+            size += (self._directory / f"{key}.ast").stat().st_size
+        for _, entry_size, other in sorted(entries):
+            if size <= self._max_size:
+                break
+            self._remove(other)
+            size -= entry_size
@@ -0,0 +1,151 @@
+import os
+import pathlib
+import re
+
+from cppygen._clang.cindex import CompilationDatabase
+
+# Options followed by a separate value which is dropped with them.
+_DROP_WITH_VALUE = {"-o", "-MF", "-MT", "-MQ"}
+
+# Options whose path value, separate or joined, is relative to the directory
+# of the compile command.
+_PATH_OPTIONS = [
+    "-I",
+    "-isystem",
+    "-iquote",
+    "-idirafter",
+    "-include",
+    "-include-pch",
+    "-imacros",
+]
+
+# Other options followed by a separate value, which is kept with them.
+_VALUE_OPTIONS = {
+    "-D",
+    "-U",
+    "-F",
+    "-x",
+    "-arch",
+    "-target",
+    "-gcc-toolchain",
+    "-isysroot",
+    "--sysroot",
+    "-iprefix",
+    "-iwithprefix",
+    "-iwithprefixbefore",
+    "-Xpreprocessor",
+}
+
+_DEBUG = re.compile(r"-g([0-3]?|gdb.*|dwarf.*|line-tables-only|split-dwarf.*)")
+
+
+def _takes_value(arg: str) -> bool:
+    return arg in _DROP_WITH_VALUE or arg in _PATH_OPTIONS or arg in _VALUE_OPTIONS
+
+
+def _is_dropped(arg: str) -> bool:
+    """
+    Options which only matter to code generation or to the build system. They
+    do not change the AST, and debug info, optimization and sanitizers slow
+    libclang down.
+    """
+    return (
+        arg in _DROP_WITH_VALUE
+        or arg in ("-c", "-M", "-MM", "-MD", "-MMD", "-MP", "--coverage")
+        or _DEBUG.fullmatch(arg) is not None
+        or arg.startswith(("-fsanitize", "-fno-sanitize"))
+        or (arg.startswith("-O") and not arg.startswith("-ObjC"))
+        or (arg.startswith("-o") and not arg.startswith("-objc"))
+        or arg.startswith(("-fprofile", "-fcoverage"))
+        # Inserted by libclang around the compiler and the input file.
+        or arg == "--"
+        or arg.startswith("--driver-mode=")
+    )
+
+
+def _absolute(path: str, directory: str) -> str:
+    return os.path.normpath(os.path.join(directory, path))
+
+
+def _units(arguments: list[str]) -> list[list[str]]:
+    """
+    Group each option with its separate value, so that both are kept or
+    dropped together. `-Xclang <option> -Xclang <value>` is one unit.
+    """
+    units = []
+    n = 0
+    while n < len(arguments):
+        arg = arguments[n]
+        width = 1
+        if arg == "-Xclang":
+            width = 2
+            option = arguments[n + 1] if n + 1 < len(arguments) else ""
+            if _takes_value(option) and arguments[n + 2 : n + 3] == ["-Xclang"]:
+                width = 4
+        elif _takes_value(arg):
+            width = 2
+        units.append(arguments[n : n + width])
+        n += width
+    return units
+
+
+def _filter_arguments(arguments: list[str], filename: str, directory: str) -> list[str]:
+    """
+    Turn the recorded compiler invocation `arguments` into libclang arguments:
+    drop the compiler, the input file and the options libclang does not need,
+    and make relative include paths absolute.
+    """
+    source = _absolute(filename, directory)
+    joined = sorted(_PATH_OPTIONS, key=len, reverse=True)
+    args = []
+    for unit in _units(arguments[1:]):
+        xclang = unit[0] == "-Xclang"
+        if xclang and len(unit) == 1:
+            continue
+        option = unit[1] if xclang else unit[0]
+        # The separate value, if the option takes one.
+        value = unit[-1] if len(unit) == (4 if xclang else 2) else None
+        if _is_dropped(option):
+            continue
+        if value is not None:
+            if option in _PATH_OPTIONS:
+                unit = [*unit[:-1], _absolute(value, directory)]
+        elif not xclang and _absolute(option, directory) == source:
+            continue
+        elif prefix := next(
+            (i for i in joined if option.startswith(i) and option != i), None
+        ):
+            unit = [*unit[:-1], prefix + _absolute(option[len(prefix) :], directory)]
+        args.extend(unit)
+    return args
+
+
+def compile_flags(
+    path: str | pathlib.Path, filenames: list[str | pathlib.Path], flags=[]
+) -> dict[str, list[str]]:
+    """
+    Read the arguments recorded for `filenames` in the compile_commands.json
+    at `path` (the file or its directory) and prepend `flags` to them. A file
+    missing from the database gets the arguments libclang infers from the
+    closest entry, files without any are left out. Identical argument vectors
+    are shared, so files compiled alike hit the same precompiled header and
+    cache entries.
+
+    Raise CompilationDatabaseError if the database can not be loaded.
+    """
+    path = pathlib.Path(path)
+    if path.name == "compile_commands.json":
+        path = path.parent
+    database = CompilationDatabase.fromDirectory(str(path.absolute()))
+    vectors: dict[tuple[str, ...], list[str]] = {}
+    file_flags = {}
+    for filename in filenames:
+        commands = database.getCompileCommands(str(pathlib.Path(filename).absolute()))
+        if not commands:
+            continue
+        command = commands[0]
+        args = list(flags) + _filter_arguments(
+            list(command.arguments), command.filename, command.directory
+        )
+        file_flags[str(filename)] = vectors.setdefault(tuple(args), args)
+    return file_flags
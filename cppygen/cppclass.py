@@ -1,13 +1,19 @@
+import collections
 import copy
 import re
 from typing import TypedDict
 
+from .scope import Scope
+
 
 class CppClass:
     """
     Represent Struct or Class.
     """
 
+    # Unified Symbol Resolution of the class, set when extracted by libclang.
+    _usr: str | None = None
+
     class MemberFunctionSignature(TypedDict):
         name: str
         pyname: str
@@ -20,7 +26,13 @@ class CppClass:
         self._name: str | None = None
         self._sanitized_name: str | None = None
         self._base_classes: list[str] = []
-        self._namespace: list[str] = []
+        # Qualified names of the bases, as the entities they refer to are
+        # named, e.g. "ns::Base" for a base written "Base".
+        self._base_names: list[str] = []
+        # (qualified template name, specialization name) of the bases which
+        # are class template specializations.
+        self._template_bases: list[tuple[str, str]] = []
+        self._scope = Scope.root()
         self._members: list[dict[str, str]] = []
         self._member_funcs: list[CppClass.MemberFunctionSignature] = []
         self._module: str | None = None
@@ -29,12 +41,12 @@ class CppClass:
         # self._defined_template_classes: list[CppClass] = defined_template_classes
         self._template_parameter: list[tuple[str, str | None]] = []
 
-    def set_name(self, name: str, namespace: list[str] | None = None):
+    def set_name(self, name: str, namespace: Scope | list[str] | None = None):
         self._name = name
         self._sanitized_name = "_".join(filter(None, re.findall(r"\w*", self._name)))
         if namespace is not None:
-            self._namespace = namespace
-        self._full_name = f"{'::'.join(self._namespace)}::{name}"
+            self._scope = Scope.of(namespace)
+        self._full_name = f"{self._scope.qualified_name}::{name}"
 
     def add_member(
         self,
@@ -52,8 +64,30 @@ class CppClass:
                 }
             )
 
-    def add_base_class(self, name: str):
+    def set_usr(self, usr: str | None):
+        self._usr = usr or None
+
+    def add_base_class(
+        self,
+        name: str,
+        template: tuple[str, str] | None = None,
+        qualified_name: str | None = None,
+    ):
         self._base_classes.append(name)
+        self._base_names.append(qualified_name or name.removeprefix("::"))
+        if template is not None:
+            self._template_bases.append(template)
+
+    def instantiate(self, name: str) -> "CppClass":
+        """
+        Return the specialization `name` (e.g. "Base<int>") of this class
+        template. It shares the members of the template rather than copying
+        them.
+        """
+        instance = copy.copy(self)
+        instance.set_name(name)
+        instance.set_usr(None)
+        return instance
 
     def add_member_func(
         self,
@@ -94,6 +128,8 @@ class CppClass:
         if self._name == None or self._module == None:
             print("Parse Error Skipping ...")
             return ""
+        # Number of overloads of each member function name.
+        overloads = collections.Counter([i["name"] for i in self._member_funcs])
         return (
             # Class
             f"pybind11::class_<"
@@ -119,7 +155,7 @@ class CppClass:
                     f'static_cast<{i["return_type"]} ({self._full_name}::*)({", ".join([j[1] for j in i["args"]])})>'
                     f'(&{self._full_name}::{i["name"]}), "{i["description"]}"'
                     f"""{f", pybind11::call_guard<{', '.join(i['call_guards'])}>()" if len(i['call_guards']) > 0 else ""})"""
-                    if [j["name"] for j in self._member_funcs].count(i["name"]) > 1
+                    if overloads[i["name"]] > 1
                     # Non overloaded funciton
                     else f'\t\t.def("{i["pyname"]}",'
                     f' &{self._full_name}::{i["name"]}, "{i["description"]}"'
@@ -133,8 +169,18 @@ class CppClass:
     def signature(self) -> str:
         return f"{self._full_name}"
 
+    @property
+    def key(self) -> str:
+        """
+        Identity of the class: its USR, or else its qualified name.
+        """
+        return self._usr or self._full_name
+
     def __eq__(self, obj):
         if isinstance(obj, CppClass):
-            return self._full_name == obj._full_name
+            return self.key == obj.key
         else:
             return False
+
+    def __hash__(self):
+        return hash(self.key)
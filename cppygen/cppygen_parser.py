@@ -1,4 +1,4 @@
-import copy
+import collections
 import os
 import re
 from typing import Literal
@@ -8,16 +8,69 @@ from cppygen._clang.cindex import (
     Config,
     Cursor,
     CursorKind,
+    Index,
+    SourceLocation,
+    SourceRange,
     TranslationUnit,
 )
 
+from . import __version__, shard
+from .ast_cache import AstCache, FileDigests
+from .digest import fingerprint
 from .cppclass import CppClass
 from .function import Function
+from .location_filter import LocationFilter
 from .logging import get_logger
+from .manifest import Manifest
+from .pch import PchCache
+from .registry import Registry
+from .scope import Scope
 from .submodule import Submodule
+from .tu_cache import TuCache
 
 logger = get_logger("parser")
 
+# Free functions bound by one registration function, so that the size of a
+# module does not make any generated function long to compile.
+_REGISTRATION_SIZE = 200
+
+# Option names accepted in a parse_options list.
+_PARSE_OPTIONS = {
+    i[len("PARSE_") :].lower(): getattr(TranslationUnit, i)
+    for i in vars(TranslationUnit)
+    if i.startswith("PARSE_")
+}
+
+
+def _check_parse_options(parse_options: str | list[str]):
+    if isinstance(parse_options, str):
+        if parse_options not in ("fast", "none"):
+            raise ValueError(
+                f'parse_options should be "fast", "none" or a list, '
+                f'not "{parse_options}"'
+            )
+        return
+    for i in parse_options:
+        if str(i).lower() not in _PARSE_OPTIONS:
+            raise ValueError(
+                f'Unknown parse option "{i}", expected one of '
+                + ", ".join(_PARSE_OPTIONS)
+            )
+
+
+class ParseError(Exception):
+    """
+    Raised when libclang reports a fatal diagnostic for a translation unit.
+    """
+
+    def __init__(self, filename: str, messages: list[str]):
+        self.filename = filename
+        self.messages = messages
+        super().__init__(f"failed to parse {filename}")
+
+    def __reduce__(self):
+        return (ParseError, (self.filename, self.messages))
+
 
 class Parser:
     """
@@ -31,16 +84,55 @@ class Parser:
         library_path: str | None = None,
         library_file: str | None = None,
         verbose: bool = False,
+        cache_dir: str | None = None,
+        manifest_file: str | None = None,
+        parse_options: str | list[str] = "fast",
+        precompiled_headers: list[str] = [],
+        pch_dir: str | None = None,
+        tu_cache: TuCache | None = None,
+        skip_system_headers: bool = True,
+        directories: list[str] | None = None,
     ):
-        self._functions: list[Function] = []
-        self._submodules: list[Submodule] = []
-        self._cpp_classes: list[CppClass] = []
-        self._export_classes: list[CppClass] = []
+        self._functions: Registry[Function] = Registry()
+        self._submodules: Registry[Submodule] = Registry()
+        self._cpp_classes: Registry[CppClass] = Registry()
+        self._export_classes: Registry[CppClass] = Registry()
         self._cpp_template_classes: list[CppClass] = []
+        # Class templates by qualified name, the first one found wins.
+        self._templates: dict[str, CppClass] = {}
         self._hpp_includes: list[str] = []
         self._namespace = namespace or "cppygen"
         self._verbose = verbose
         self._call_guards: list[str] = []
+        self._index: Index | None = None
+        self._cache_dir = cache_dir
+        # Content hashes shared by the AST cache and the manifest.
+        digests = FileDigests()
+        self._ast_cache = None
+        if cache_dir is not None:
+            self._ast_cache = AstCache(cache_dir, digests)
+        self._manifest = None
+        if manifest_file is not None:
+            self._manifest = Manifest(manifest_file, digests)
+        self._dependencies: dict[str, None] = {}
+        # Entities and dependencies contributed by each parsed file, and the
+        # arguments it was parsed with (see update_file).
+        self._models: dict[object, tuple[tuple, list[str]]] = {}
+        self._parse_args: dict[str, tuple] = {}
+        _check_parse_options(parse_options)
+        self._parse_options = parse_options
+        self._precompiled_headers = list(precompiled_headers)
+        self._pch = None
+        if self._precompiled_headers:
+            if pch_dir is None and cache_dir is not None:
+                pch_dir = os.path.join(cache_dir, "pch")
+            self._pch = PchCache(self._precompiled_headers, pch_dir)
+        self._tu_cache = tu_cache
+        self._skip_system_headers = skip_system_headers
+        self._directories = None if directories is None else list(directories)
+        self._location_filter = None
+        if skip_system_headers or directories is not None:
+            self._location_filter = LocationFilter(skip_system_headers, directories)
 
         if library_file != None and library_path != None:
             raise ValueError(f"Both library_path and library_file cannot be set.")
@@ -59,93 +151,183 @@ class Parser:
                 Config.set_library_file(cppygen_libclang_path)
             return
 
-    def _get_tu(self, source: str, filename: str, flags=[]) -> TranslationUnit:
-        if flags == None:
-            flags = []
+    @property
+    def index(self) -> Index:
+        """
+        The libclang Index shared by every translation unit this Parser builds.
+        """
+        if self._index is None:
+            if self._tu_cache is not None:
+                self._index = self._tu_cache.index
+            else:
+                self._index = Index.create()
+        return self._index
+
+    def _get_args(self, flags=[]) -> list[str]:
+        args = list(flags or [])
         if (cppygen_flags := os.environ.get("CPPYGEN_COMPILE_FLAGS", None)) is not None:
-            flags.extend(cppygen_flags.split(" "))
-        args = list(flags)
+            args.extend(cppygen_flags.split(" "))
+        return args
+
+    def _get_options(self, lang: str = "cpp", mode: str = "source") -> int:
+        """
+        Translate the parse_options profile into TranslationUnit.PARSE_* flags.
+
+        "fast" parses headers as incomplete translation units and, in header
+        mode, skips function bodies, which are never needed to extract
+        declarations. Source mode exports definitions only, which a skipped
+        body can hide (see _is_definition). "none" parses everything. A list
+        selects options by name, e.g. ["skip_function_bodies", "incomplete"].
+        """
+        if self._parse_options == "fast":
+            options = TranslationUnit.PARSE_NONE
+            if mode == "header":
+                options |= TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+            if lang == "hpp":
+                options |= TranslationUnit.PARSE_INCOMPLETE
+            return options
+        if self._parse_options == "none":
+            return TranslationUnit.PARSE_NONE
+        options = TranslationUnit.PARSE_NONE
+        for i in self._parse_options:
+            options |= _PARSE_OPTIONS[i.lower()]
+        return options
+
+    def _get_tu(
+        self,
+        source: str,
+        filename: str,
+        flags=[],
+        lang: str = "cpp",
+        mode: str = "source",
+    ) -> TranslationUnit:
+        args = self._get_args(flags)
+        options = self._get_options(lang, mode)
         name = filename
-        return TranslationUnit.from_source(
+        cache_args = [*args, f"<options {options}>"]
+        if self._pch is not None and (
+            pch := self._pch.get(self.index, args, options)
+        ) is not None:
+            self._dependencies.update(dict.fromkeys(pch[1]))
+            args = [*args, "-include-pch", pch[0]]
+            cache_args = [*cache_args, f"<pch {os.stat(pch[0]).st_mtime_ns}>"]
+        if self._tu_cache is not None:
+            return self._tu_cache.get(source, name, args, options)
+        if self._ast_cache is not None:
+            key = self._ast_cache.key(source, name, cache_args)
+            if (tu := self._ast_cache.load(self.index, key)) is not None:
+                return tu
+        tu = TranslationUnit.from_source(
             name,
             args,
             unsaved_files=[(name, source)],
-            options=TranslationUnit.PARSE_NONE,
+            options=options,
+            index=self.index,
         )
+        if self._ast_cache is not None and not any(
+            diag.severity in [diag.Fatal, diag.Error] for diag in tu.diagnostics
+        ):
+            self._ast_cache.store(tu, key)
+        return tu
 
-    def _extract_functions(
-        self,
-        cu: Cursor,
-        namespace: list[str],
-        module_name: str,
-        mode: Literal["source"] | Literal["header"] = "source",
-    ):
-        for i in list(cu.get_children()):
-            i: Cursor
-            if i.kind == CursorKind.FUNCTION_DECL and (i.is_definition() or mode == "header"):  # type: ignore
-                func = Function()
-                func.set_return_type(i.result_type.spelling)
-                func.set_name(i.spelling, namespace)
-                func.set_module(module_name)
-                for call_guard in self._call_guards:
-                    func.add_call_guard(call_guard)
-
-                # extract comment string
-                raw_comment = i.raw_comment or ""
-                raw_comment = raw_comment.replace('"', '\\"')
-                # print("raw_comment", raw_comment)
-
-                pyname, description = _extract_comment_string(str(raw_comment))
-
-                if pyname is not None:
-                    func.pyname = pyname
-                func.set_description(description and description or "")
-
-                for j in list(i.get_children()):
-                    j: Cursor
-                    if j.kind == CursorKind.PARM_DECL:  # type: ignore
-                        func.add_argument_type((j.spelling, j.type.spelling))
-                if self._verbose:
-                    print("\t| Function    | " + func.signature())
-                if not func in self._functions:
-                    self._functions.append(func)
-
-    def _extract_struct_and_class(
-        self, cu: Cursor, namespace: list[str], module_name: str
+    def _is_definition(self, cursor: Cursor) -> bool:
+        if cursor.is_definition():
+            return True
+        if not self._get_options() & TranslationUnit.PARSE_SKIP_FUNCTION_BODIES:
+            return False
+        # A definition whose body was skipped looks like a declaration, tell
+        # them apart by the token following the declarator. This can not see
+        # through a definition expanded from a macro, which the "fast" profile
+        # therefore parses with its body in source mode.
+        # The buffer is the one the translation unit was parsed from, which
+        # may only exist in memory.
+        end = cursor.extent.end
+        tu = cursor.translation_unit
+        if end.file is None or (size := tu.get_file_size(end.file)) is None:
+            return False
+        window = SourceLocation.from_offset(tu, end.file, min(end.offset + 1024, size))
+        for token in tu.get_tokens(extent=SourceRange.from_locations(end, window)):
+            if token.spelling in ("{", "try"):
+                return True
+            if token.spelling in (";", "=", ","):
+                return False
+        return False
+
+    def _extract_function(self, i: Cursor, namespace: Scope, module_name: str):
+        usr = i.get_usr()
+        if usr and self._functions.has_key(usr):
+            # Redeclared, the first declaration found is kept.
+            return
+        func = Function()
+        func.set_usr(usr)
+        func.set_return_type(i.result_type.spelling)
+        func.set_name(i.spelling, namespace)
+        func.set_module(module_name)
+        for call_guard in self._call_guards:
+            func.add_call_guard(call_guard)
+
+        # extract comment string
+        raw_comment = i.raw_comment or ""
+        raw_comment = raw_comment.replace('"', '\\"')
+        # print("raw_comment", raw_comment)
+
+        pyname, description = _extract_comment_string(str(raw_comment))
+
+        if pyname is not None:
+            func.pyname = pyname
+        func.set_description(description and description or "")
+
+        for j in i.find_children([CursorKind.PARM_DECL]):  # type: ignore
+            j: Cursor
+            func.add_argument_type((j.spelling, j.type.spelling))
+        if self._verbose:
+            print("\t| Function    | " + func.signature())
+        self._add_function(func)
+
+    def _extract_class(
+        self, cu: Cursor, namespace: Scope, module_name: str, is_template: bool
     ):
-        def visit(i: Cursor, namespace: list[str], is_template):
-            print(i.kind)
+        def visit(i: Cursor, namespace: Scope, is_template):
+            if not i.is_definition():
+                # Forward declaration, the class is extracted from its
+                # definition.
+                return
+            usr = i.get_usr()
+            if usr and self._cpp_classes.has_key(usr):
+                # Already extracted, e.g. from a precompiled header.
+                return
+            scope = namespace.child(i.spelling)
             cpp_class = CppClass(is_template)
             cpp_class.set_name(i.spelling, namespace)
+            cpp_class.set_usr(usr)
             cpp_class.set_module(module_name)
             cpp_class.set_description(i.brief_comment or "")
             if self._verbose:
                 print("\t| Class       | " + cpp_class.signature())
-            for j in list(i.get_children()):
+            for j in i.find_children(
+                [
+                    CursorKind.CXX_BASE_SPECIFIER,  # type: ignore
+                    CursorKind.STRUCT_DECL,  # type: ignore
+                    CursorKind.CLASS_DECL,  # type: ignore
+                    CursorKind.CLASS_TEMPLATE,  # type: ignore
+                    CursorKind.FIELD_DECL,  # type: ignore
+                    CursorKind.CXX_METHOD,  # type: ignore
+                ]
+            ):
                 j: Cursor
-                if j.kind == CursorKind.CXX_BASE_SPECIFIER:  # type: ignore
+                kind = j.kind
+                if kind == CursorKind.CXX_BASE_SPECIFIER:  # type: ignore
                     if self._verbose:
-                        print(
-                            "\t| BaseClass   | "
-                            + "::".join([*namespace, i.spelling])
-                            + j.spelling
-                        )
-                    cpp_class.add_base_class(j.spelling)
-                    teplate_declares = copy.deepcopy(
-                        [j for j in self._cpp_classes if j._is_template]
+                        print("\t| BaseClass   | " + scope.qualified_name + j.spelling)
+                    template = _base_template(j)
+                    cpp_class.add_base_class(
+                        j.spelling, template, _base_name(j, template)
                     )
-
-                    for k in teplate_declares:
-                        if k._full_name in j.spelling:
-                            base_class = copy.deepcopy(k)
-                            base_class.set_name(j.spelling.split("::")[-1])
-                            if base_class not in self._export_classes:
-                                self._export_classes.append(base_class)
-                if j.kind == CursorKind.STRUCT_DECL or j.kind == CursorKind.CLASS_DECL:  # type: ignore
-                    visit(j, [*namespace, i.spelling], False)
-                if j.kind == CursorKind.CLASS_TEMPLATE:  # type: ignore
-                    visit(j, [*namespace, i.spelling], True)
-                if j.kind == CursorKind.FIELD_DECL:  # type: ignore
+                if kind == CursorKind.STRUCT_DECL or kind == CursorKind.CLASS_DECL:  # type: ignore
+                    visit(j, scope, False)
+                if kind == CursorKind.CLASS_TEMPLATE:  # type: ignore
+                    visit(j, scope, True)
+                if kind == CursorKind.FIELD_DECL:  # type: ignore
                     # メンバー変数の抽出
                     cpp_class.add_member(
                         j.spelling,
@@ -156,18 +338,17 @@ class Parser:
                     if self._verbose:
                         print(
                             "\t| ClassMember | "
-                            + "::".join([*namespace, i.spelling])
+                            + scope.qualified_name
                             + "  "
                             + j.type.spelling
                             + " "
                             + j.spelling
                         )
-                elif j.kind == CursorKind.CXX_METHOD:  # type: ignore
+                elif kind == CursorKind.CXX_METHOD:  # type: ignore
                     # メンバー関数の抽出
                     args = []
-                    for k in list(j.get_children()):
-                        if k.kind == CursorKind.PARM_DECL:  # type: ignore
-                            args.append((k.spelling, k.type.spelling))
+                    for k in j.find_children([CursorKind.PARM_DECL]):  # type: ignore
+                        args.append((k.spelling, k.type.spelling))
                     (pyname, description) = _extract_comment_string(j.raw_comment or "")
                     cpp_class.add_member_func(
                         name=j.spelling,
@@ -181,7 +362,7 @@ class Parser:
                     if self._verbose:
                         print(
                             "\t| ClassMethod | "
-                            + "::".join([*namespace, i.spelling])
+                            + scope.qualified_name
                             + "::"
                             + j.spelling
                             + "("
@@ -189,16 +370,77 @@ class Parser:
                             + ") -> "
                             + j.result_type.spelling
                         )
-            self._cpp_classes.append(cpp_class)
-            if not cpp_class._is_template:
-                self._export_classes.append(cpp_class)
+            self._add_cpp_class(cpp_class)
+
+        visit(cu, namespace, is_template)
+
+    def _add_function(self, func: Function):
+        self._functions.add(func)
+
+    def _add_submodule(self, submod: Submodule) -> bool:
+        return self._submodules.add(submod)
+
+    def _add_cpp_class(self, cpp_class: CppClass):
+        # A class found again, in another translation unit, is registered and
+        # exported once.
+        if cpp_class in self._cpp_classes:
+            return
+        # Export the instantiations of already known class templates which
+        # this class derives from.
+        for template, name in cpp_class._template_bases:
+            if (template_class := self._templates.get(template)) is not None:
+                self._export_classes.add(template_class.instantiate(name))
+        self._cpp_classes.append(cpp_class)
+        if cpp_class._is_template:
+            self._templates.setdefault(cpp_class._full_name, cpp_class)
+        else:
+            self._export_classes.append(cpp_class)
+
+    def get_model(self) -> tuple[list[Function], list[Submodule], list[CppClass]]:
+        """
+        Return the extracted entities in the order they were found.
+        """
+        return (
+            list(self._functions),
+            list(self._submodules),
+            list(self._cpp_classes),
+        )
+
+    def get_dependencies(self) -> list[str]:
+        """
+        Return every file read by the translation units parsed so far.
+        """
+        return list(self._dependencies)
 
-        i: Cursor
-        for i in list(cu.get_children()):
-            if i.kind == CursorKind.CLASS_TEMPLATE:  # type: ignore
-                visit(i, namespace, True)
-            if i.kind == CursorKind.STRUCT_DECL or i.kind == CursorKind.CLASS_DECL:  # type: ignore
-                visit(i, namespace, False)
+    def merge_model(
+        self,
+        model: tuple[list[Function], list[Submodule], list[CppClass]],
+        dependencies: list[str] = [],
+        filename: str | None = None,
+    ):
+        """
+        Merge entities extracted by another Parser (see `get_model`) as if they
+        had been parsed by this one. A later merge for the same `filename`
+        replaces the entities of the earlier one once update_file rebuilds the
+        model.
+        """
+        key = str(filename) if filename is not None else object()
+        self._models[key] = (model, list(dependencies))
+        self._merge(model, dependencies)
+
+    def _merge(
+        self,
+        model: tuple[list[Function], list[Submodule], list[CppClass]],
+        dependencies: list[str],
+    ):
+        self._dependencies.update(dict.fromkeys(dependencies))
+        functions, submodules, cpp_classes = model
+        for func in functions:
+            self._add_function(func)
+        for submod in submodules:
+            self._add_submodule(submod)
+        for cpp_class in cpp_classes:
+            self._add_cpp_class(cpp_class)
 
     def add_hpp_includes(self, hpp: str):
         self._hpp_includes.append(hpp)
@@ -215,51 +457,174 @@ class Parser:
         with_diagnostic=False,
         mode: Literal["source"] | Literal["header"] = "source",
     ):
-        tu: TranslationUnit = self._get_tu(source, filename, flags)
+        self._parse_args[str(filename)] = (lang, list(flags), with_diagnostic, mode)
+        if self._manifest is not None:
+            key = self._manifest_key(source, filename, lang, flags, mode)
+            if (entry := self._manifest.lookup(filename, key)) is None:
+                child = self._child()
+                child.parse(source, filename, lang, flags, with_diagnostic, mode)
+                entry = (child.get_model(), child.get_dependencies())
+                self._manifest.record(filename, key, *entry)
+            self.merge_model(*entry, filename)
+            return
+        # Parsed by a child so that the files read for the precompiled header
+        # are recorded as dependencies of `filename` (see update_file).
+        child = self._child()
+        tu: TranslationUnit = child._get_tu(source, filename, flags, lang, mode)
+        child.parse_tu(tu, filename, lang, with_diagnostic, mode)
+        self.merge_model(child.get_model(), child.get_dependencies(), filename)
+
+    def _manifest_key(self, source: str, filename: str, lang: str, flags, mode) -> str:
+        return fingerprint(
+            __version__,
+            source,
+            str(filename),
+            lang,
+            mode,
+            self._get_args(flags),
+            self._get_options(lang, mode),
+            self._precompiled_headers,
+            self._namespace,
+            self._call_guards,
+            self._skip_system_headers,
+            self._directories,
+        )
+
+    def _child(self) -> "Parser":
+        """
+        Create a Parser with the same settings and libclang Index, but without
+        any extracted entities.
+        """
+        child = Parser(
+            self._namespace,
+            verbose=self._verbose,
+            parse_options=self._parse_options,
+            skip_system_headers=self._skip_system_headers,
+            directories=self._directories,
+        )
+        child._call_guards = list(self._call_guards)
+        child._index = self.index
+        child._ast_cache = self._ast_cache
+        child._precompiled_headers = self._precompiled_headers
+        child._pch = self._pch
+        child._tu_cache = self._tu_cache
+        child._location_filter = self._location_filter
+        return child
+
+    def save_manifest(self):
+        if self._manifest is not None:
+            self._manifest.save()
+
+    def parse_tu(
+        self,
+        tu: TranslationUnit,
+        filename: str,
+        lang: str = "cpp",
+        with_diagnostic=False,
+        mode: Literal["source"] | Literal["header"] = "source",
+    ):
+        """
+        Extract entities from an already parsed translation unit.
+        """
+        dependencies = [filename, *[i.include.name for i in tu.get_includes()]]
         if with_diagnostic:
-            has_error = False
+            errors = []
             for diag in tu.diagnostics:
                 if diag.severity in [diag.Fatal, diag.Error]:
-                    has_error = True
-                    logger.error(
+                    errors.append(
                         f"{diag.location.file}:{diag.location.line}:{diag.location.column}: error: {diag.spelling} [{diag.option}]"
                     )
-            if has_error:
-                exit(1)
-        root: Cursor = tu.cursor
-        for i in list(root.get_children()):
+            if errors:
+                raise ParseError(filename, errors)
+        child = self._child()
+        child._extract(tu, lang, mode)
+        self.merge_model(child.get_model(), dependencies, filename)
+
+    def _extract(self, tu: TranslationUnit, lang: str, mode: str):
+        if mode == "source":
+            functions, classes = lang == "cpp", lang == "hpp"
+        elif mode == "header":
+            functions, classes = True, True
+        else:
+            raise KeyError('Mode should be "source" or "header"')
+
+        # Each child of a namespace is listed once and dispatched on its kind.
+        # Nested namespaces are visited after the other children, so that the
+        # entities of a namespace come before those of its submodules.
+        def visit(x: Cursor, namespace: Scope, module_name: str):
+            namespaces = []
+            for i in x.find_children(
+                [
+                    CursorKind.NAMESPACE,  # type: ignore
+                    CursorKind.FUNCTION_DECL,  # type: ignore
+                    CursorKind.STRUCT_DECL,  # type: ignore
+                    CursorKind.CLASS_DECL,  # type: ignore
+                    CursorKind.CLASS_TEMPLATE,  # type: ignore
+                ],
+                skip=self._location_filter,
+            ):
+                i: Cursor
+                kind = i.kind
+                if kind == CursorKind.NAMESPACE:  # type: ignore
+                    namespaces.append(i)
+                elif kind == CursorKind.FUNCTION_DECL:  # type: ignore
+                    if functions and (mode == "header" or self._is_definition(i)):
+                        self._extract_function(i, namespace, module_name)
+                elif kind == CursorKind.STRUCT_DECL or kind == CursorKind.CLASS_DECL:  # type: ignore
+                    if classes:
+                        self._extract_class(i, namespace, module_name, False)
+                elif kind == CursorKind.CLASS_TEMPLATE:  # type: ignore
+                    if classes:
+                        self._extract_class(i, namespace, module_name, True)
+            for i in namespaces:
+                submod = Submodule()
+                submod.set_name(i.spelling)
+                submod.set_description(i.brief_comment or "")
+                submod.set_parent(namespace)
+                if self._add_submodule(submod) and self._verbose:
+                    print(f"\t| Submodule   | {submod.cpp_name}")
+                visit(i, namespace.child(i.spelling), submod.cpp_name)
+
+        # Search top-level namespace, cursors from system headers or from
+        # outside the exported directories are dropped while visiting.
+        for i in tu.cursor.find_children(
+            [CursorKind.NAMESPACE], skip=self._location_filter  # type: ignore
+        ):
             i: Cursor
+            if i.spelling == self._namespace:
+                visit(i, Scope.root().child(self._namespace), self._namespace)
 
-            # Recursive Function
-            def visit(x: Cursor, namespace: list[str], module_name: str):
-                if mode == "source":
-                    if lang == "cpp":
-                        self._extract_functions(x, namespace, module_name)
-                    elif lang == "hpp":
-                        self._extract_struct_and_class(x, namespace, module_name)
-                elif mode == "header":
-                    self._extract_functions(x, namespace, module_name, mode="header")
-                    self._extract_struct_and_class(x, namespace, module_name)
-                else:
-                    raise KeyError('Mode should be "source" or "header"')
-                for i in list(x.get_children()):
-                    i: Cursor
-                    namespace_in = copy.deepcopy(namespace)
-                    if i.kind == CursorKind.NAMESPACE:  # type: ignore
-                        submod = Submodule()
-                        submod.set_name(i.spelling)
-                        submod.set_description(i.brief_comment or "")
-                        submod.set_parent(copy.deepcopy(namespace_in))
-                        if not submod in self._submodules:
-                            if self._verbose:
-                                print(f"\t| Submodule   | {submod.cpp_name}")
-                            self._submodules.append(submod)
-                        namespace_in.append(i.spelling)
-                        visit(i, namespace_in, submod.cpp_name)
-
-            # Search top-level namespace
-            if i.kind == CursorKind.NAMESPACE and i.spelling == self._namespace:  # type: ignore
-                visit(i, [self._namespace], self._namespace)
+    def update_file(self, filename: str, contents: str | None = None):
+        """
+        Extract `filename`, previously parsed by this Parser, again from
+        `contents` (read from disk if None) and replace the entities it
+        contributed, keeping the order of a full parse. The translation unit is
+        kept in the TuCache of this Parser and reparsed by later calls. Without
+        a TuCache given to the Parser one is created by the first call, which
+        parses the file from scratch.
+        """
+        if (args := self._parse_args.get(str(filename))) is None:
+            raise KeyError(f"{filename} was not parsed by this Parser")
+        lang, flags, with_diagnostic, mode = args
+        if self._tu_cache is None:
+            self._tu_cache = TuCache()
+        if contents is None:
+            with open(filename, "r") as f:
+                contents = f.read()
+        child = self._child()
+        tu = child._get_tu(contents, str(filename), flags, lang, mode)
+        child.parse_tu(tu, str(filename), lang, with_diagnostic, mode)
+        self._models[str(filename)] = (child.get_model(), child.get_dependencies())
+
+        self._functions = Registry()
+        self._submodules = Registry()
+        self._cpp_classes = Registry()
+        self._export_classes = Registry()
+        self._templates = {}
+        # Files no longer included by `filename` are dropped.
+        self._dependencies = {}
+        for model, dependencies in self._models.values():
+            self._merge(model, dependencies)
 
     def parse_from_file(
         self,
@@ -272,10 +637,11 @@ class Parser:
             data = f.read()
         self.parse(data, filename, lang, flags, with_diagnostic=True, mode=mode)
 
-    def to_decl_string(self):
+    def to_decl_string(self, functions: list[Function] | None = None):
+        functions = self._functions if functions is None else functions
         return (
             "/* Function Declarations Start */\n"
-            + "\n".join([i.to_decl_string() for i in self._functions] + [""])
+            + "\n".join([i.to_decl_string() for i in functions] + [""])
             + "/* Function Declarations End */\n\n"
         )
 
@@ -286,33 +652,113 @@ class Parser:
             + "\t/* Submodule Declarations End */\n\n"
         )
 
-    def to_export_string(self):
-        return (
-            "\t/* Function Export Start */\n"
-            + "\n".join(
-                [
-                    # overloaded function
-                    "\t" + i.to_pybind_string(overloaded=True)
-                    # Check if more than two function has same signature.
-                    if [j._full_name for j in self._functions].count(i._full_name) > 1
-                    # Non overloaded function
-                    else "\t" + i.to_pybind_string()
-                    for i in self._functions
-                ]
-                + [""]
+    def _registrations(
+        self,
+        functions: list[Function] | None = None,
+        classes: list[CppClass] | None = None,
+    ) -> tuple[list[tuple[str, str, list[str]]], list[tuple[str, str, list[str]]]]:
+        """
+        Group the bindings into registration functions: one per class, and for
+        free functions one per module and chunk of _REGISTRATION_SIZE. Return
+        ([(name, module, statements)],)*2.
+        """
+        functions = self._functions if functions is None else functions
+        classes = self._export_classes if classes is None else classes
+        names = set()
+
+        def unique(name: str) -> str:
+            name = "register_" + "_".join(filter(None, re.findall(r"\w*", name)))
+            n, base = 1, name
+            while name in names:
+                n, name = n + 1, f"{base}_{n + 1}"
+            names.add(name)
+            return name
+
+        # Number of overloads of each function name, over every function so
+        # that shards agree.
+        overloads = collections.Counter([j._full_name for j in self._functions])
+        groups: dict[str, list[str]] = {}
+        for i in functions:
+            groups.setdefault(i._module or "", []).append(
+                # overloaded function
+                i.to_pybind_string(overloaded=True)
+                # Check if more than two function has same signature.
+                if overloads[i._full_name] > 1
+                # Non overloaded function
+                else i.to_pybind_string()
             )
-            + "\t/* Function Export End */\n\n"
-            + "\t/* Structs and Classes Export Start */\n"
-            + "\n".join(
-                ["\t" + i.to_pybind_string() for i in self._export_classes] + [""]
+        return (
+            [
+                (
+                    unique(f"functions_{module}"),
+                    module,
+                    statements[start : start + _REGISTRATION_SIZE],
+                )
+                for module, statements in groups.items()
+                for start in range(0, len(statements), _REGISTRATION_SIZE)
+            ],
+            [
+                (unique(i._full_name), i._module or "", [i.to_pybind_string()])
+                for i in classes
+            ],
+        )
+
+    def _render(
+        self,
+        functions: list[Function] | None = None,
+        classes: list[CppClass] | None = None,
+        inline: bool = False,
+    ) -> tuple[str, str]:
+        """
+        Render the bindings once into the definitions of the registration
+        functions and the statements calling them (see to_register_string and
+        to_export_string).
+        """
+
+        def define(name: str, module: str, statements: list[str]) -> str:
+            return (
+                f"static {'inline ' if inline else ''}void {name}(pybind11::module_ &{module})\n"
+                "{\n" + "".join([f"\t{i}\n" for i in statements]) + "}\n"
             )
-            + "\t/* Structs and Classes Export End */\n\n"
+
+        function_groups, class_groups = self._registrations(functions, classes)
+        register = (
+            "/* Function Export Start */\n"
+            + "\n".join([define(*i) for i in function_groups])
+            + "/* Function Export End */\n\n"
+            + "/* Structs and Classes Export Start */\n"
+            + "\n".join([define(*i) for i in class_groups])
+            + "/* Structs and Classes Export End */\n\n"
+        )
+        export = "".join(
+            [f"\t{name}({module});\n" for name, module, _ in function_groups]
+            + [f"\t{name}({module});\n" for name, module, _ in class_groups]
         )
+        return register, export
+
+    def to_register_string(
+        self,
+        functions: list[Function] | None = None,
+        classes: list[CppClass] | None = None,
+        inline: bool = False,
+    ):
+        """
+        Definitions of the registration functions called by to_export_string.
+        """
+        return self._render(functions, classes, inline)[0]
+
+    def to_export_string(
+        self,
+        functions: list[Function] | None = None,
+        classes: list[CppClass] | None = None,
+    ):
+        return self._render(functions, classes)[1]
 
     def generate(self) -> str:
         """
         inline 関数を実装した、 header only なコードを自動生成する関数
         """
+        register, export = self._render(inline=True)
         return (
             "#pragma once\n\n"
             "#include <pybind11/cast.h>\n"
@@ -325,10 +771,11 @@ class Parser:
             f"{self.to_decl_string()}\n"
             "\n"
             "namespace CPPyGen {\n\n"
+            f"{register}"
             f"static inline void CPPyGenExport(pybind11::module_ {self._namespace})\n"
             "{\n\n"
-            f"{self.to_submod_string()}\n\n"
-            f"{self.to_export_string()}\n\n"
+            f"{self.to_submod_string()}"
+            f"{export}\n"
             "};\n"
             "}"
         )
@@ -337,6 +784,7 @@ class Parser:
         """
         hpp_generate と対になる。 Export の関数の実装部分を自動生成するコード
         """
+        register, export = self._render()
         return (
             '#include "cppygen_generated.hpp"\n\n'
             "#include <pybind11/cast.h>\n"
@@ -347,10 +795,88 @@ class Parser:
             f"{self.to_decl_string()}\n"
             "\n"
             "namespace CPPyGen {\n\n"
+            f"{register}"
+            f"void CPPyGenExport(pybind11::module_ {self._namespace})\n"
+            "{\n\n"
+            f"{self.to_submod_string()}"
+            f"{export}\n"
+            "};\n"
+            "}"
+        )
+
+    def cpp_generate_shards(
+        self,
+        count: int,
+        by: Literal["balanced"] | Literal["submodule"] = "balanced",
+    ) -> tuple[str, list[str]]:
+        """
+        Split the code of cpp_generate into a main source defining
+        CPPyGenExport and `count` shard sources (cppygen_generated_<n>.cpp),
+        which can be compiled in parallel. Each shard defines
+        CPPyGenExport_<n>, CPPyGenExport creates the submodules and calls them
+        in order.
+        """
+        shards = shard.split([*self._functions, *self._export_classes], count, by)
+        main = (
+            '#include "cppygen_generated.hpp"\n\n'
+            "#include <pybind11/cast.h>\n"
+            "#include <pybind11/pybind11.h>\n"
+            "#include <pybind11/pytypes.h>\n"
+            "#include <pybind11/stl.h>\n\n"
+            "\n"
+            "namespace CPPyGen {\n\n"
+            + "".join(
+                [
+                    f"void CPPyGenExport_{n}(pybind11::module_ &{self._namespace});\n"
+                    for n in range(count)
+                ]
+            )
+            + "\n"
             f"void CPPyGenExport(pybind11::module_ {self._namespace})\n"
             "{\n\n"
             f"{self.to_submod_string()}\n\n"
-            f"{self.to_export_string()}\n\n"
+            + "".join(
+                [f"\tCPPyGenExport_{n}({self._namespace});\n" for n in range(count)]
+            )
+            + "\n};\n"
+            "}"
+        )
+        return main, [self._shard_generate(n, i) for n, i in enumerate(shards)]
+
+    def _shard_generate(self, n: int, entities: list[Function | CppClass]) -> str:
+        functions = [i for i in entities if isinstance(i, Function)]
+        classes = [i for i in entities if isinstance(i, CppClass)]
+        # Borrow the submodules created by CPPyGenExport, parents first.
+        by_name = {i.cpp_name: i for i in self._submodules}
+        used = set()
+        for module in {i._module for i in entities}:
+            while module in by_name and module not in used:
+                used.add(module)
+                module = by_name[module].cpp_parent_name
+        submodules = [i for i in self._submodules if i.cpp_name in used]
+        register, export = self._render(functions, classes)
+        return (
+            '#include "cppygen_generated.hpp"\n\n'
+            "#include <pybind11/cast.h>\n"
+            "#include <pybind11/pybind11.h>\n"
+            "#include <pybind11/pytypes.h>\n"
+            "#include <pybind11/stl.h>\n\n"
+            "\n"
+            f"{self.to_decl_string(functions)}\n"
+            "\n"
+            "namespace CPPyGen {\n\n"
+            f"{register}"
+            f"void CPPyGenExport_{n}(pybind11::module_ &{self._namespace})\n"
+            "{\n"
+            + "".join(
+                [
+                    f"\tauto {i.cpp_name} = pybind11::reinterpret_borrow<pybind11::module_>"
+                    f'({i.cpp_parent_name}.attr("{i._name}"));\n'
+                    for i in submodules
+                ]
+            )
+            + "\n"
+            f"{export}\n"
             "};\n"
             "}"
         )
@@ -374,6 +900,53 @@ class Parser:
         )
 
 
+def _base_template(base: Cursor) -> tuple[str, str] | None:
+    """
+    If the base specifier `base` names a specialization of a class template,
+    return the qualified name of the template, found from the declaration the
+    base refers to, and the name of the specialization, e.g.
+    ("ns::Base", "Base<int>").
+    """
+    canonical = base.type.get_canonical()
+    declaration = canonical.get_declaration()
+    if declaration.kind not in (CursorKind.STRUCT_DECL, CursorKind.CLASS_DECL):  # type: ignore
+        # Dependent bases of templates have no specialization.
+        return None
+    name = None
+    # As written, or through an alias.
+    for spelling in (base.spelling, canonical.spelling):
+        if (start := spelling.find(f"{declaration.spelling}<")) != -1:
+            name = spelling[start:]
+            break
+    if name is None:
+        return None
+    return _qualified_name(declaration), name
+
+
+def _base_name(base: Cursor, template: tuple[str, str] | None) -> str | None:
+    """
+    Qualified name of the class the base specifier `base` refers to, however
+    it is written, e.g. "ns::Base<int>" for the template base `template` or
+    "ns::Base" for "Base" written in a scope using namespace ns.
+    """
+    if template is not None:
+        scope, _, _ = template[0].rpartition("::")
+        return f"{scope}::{template[1]}" if scope else template[1]
+    declaration = base.type.get_canonical().get_declaration()
+    if declaration.kind not in (CursorKind.STRUCT_DECL, CursorKind.CLASS_DECL):  # type: ignore
+        return None
+    return _qualified_name(declaration)
+
+
+def _qualified_name(declaration: Cursor) -> str:
+    scopes = []
+    cursor = declaration
+    while cursor is not None and cursor.kind != CursorKind.TRANSLATION_UNIT:  # type: ignore
+        scopes.append(cursor.spelling)
+        cursor = cursor.semantic_parent
+    return "::".join(reversed(scopes))
+
+
 def _extract_comment_string(raw_comment: str) -> tuple[str | None, str | None]:
     return (
         (re.search(r"pyname: *(.*)", raw_comment) or [None, None])[1],
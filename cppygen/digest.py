@@ -0,0 +1,37 @@
+import hashlib
+import os
+import pathlib
+from typing import Any
+
+
+def fingerprint(*items: Any) -> str:
+    """
+    sha256 of the representations of `items`, e.g. the settings of a run.
+    """
+    h = hashlib.sha256()
+    for i in items:
+        h.update(repr(i).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_digest(filename: str | pathlib.Path) -> str | None:
+    """
+    sha256 of the file contents, or None if it can not be read.
+    """
+    try:
+        with open(filename, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def file_stat(filename: str | pathlib.Path) -> tuple[int, int] | None:
+    """
+    (modification time in ns, size) of the file, or None if it does not exist.
+    """
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
@@ -1,24 +1,37 @@
+from .scope import Scope
+
+
 class Function(object):
     """
     Function を表すクラス。
     必要な情報を詰め込み、 to_pybind_string で生成する。
     """
 
+    # Cached by key, reset by the setters it depends on.
+    _key: str | None = None
+    # Unified Symbol Resolution of the function, set when extracted by libclang.
+    _usr: str | None = None
+
     def __init__(self):
         self._return_type: str = ""
         self._arguments: list[tuple[str, str]] = []
         self._name: str | None = None
         self._full_name: str | None = None
-        self._namespace: list[str] = []
+        self._scope = Scope.root()
         self._description = ""
         self._module: str | None = None
         self._pyname: str | None = None
         self._call_guards: list[str] = []
 
-    def set_name(self, name: str, namespace: list[str]):
+    def set_name(self, name: str, namespace: Scope | list[str]):
         self._name = name
-        self._namespace = namespace
-        self._full_name = f"{'::'.join(namespace)}::{name}"
+        self._scope = Scope.of(namespace)
+        self._full_name = f"{self._scope.qualified_name}::{name}"
+        self._key = None
+
+    def set_usr(self, usr: str | None):
+        self._usr = usr or None
+        self._key = None
 
     def set_return_type(self, type: str):
         self._return_type = type
@@ -31,6 +44,7 @@ class Function(object):
         parameter: [(name, type),]
         """
         self._arguments = types
+        self._key = None
 
     @property
     def pyname(self):
@@ -45,6 +59,7 @@ class Function(object):
         parameter: (name, type)
         """
         self._arguments.append(type)
+        self._key = None
 
     def set_description(self, description: str):
         self._description = description
@@ -77,21 +92,33 @@ class Function(object):
             return ""
         args = [f"{i[1]}" for i in self._arguments]
         return (
-            f'namespace {"::".join(self._namespace)} '
+            f"namespace {self._scope.qualified_name} "
             f'{{ {self._return_type} {self._name}({", ".join(args)}); }}'
         )
 
     def signature(self, with_return_type=True) -> str:
         args = [f"{i[1]}" for i in self._arguments]
         if with_return_type:
-            return f'{"::".join(self._namespace)}::{self._name}({", ".join(args)}) -> {self._return_type}'
+            return f'{self._scope.qualified_name}::{self._name}({", ".join(args)}) -> {self._return_type}'
         else:
-            return f'{"::".join(self._namespace)}::{self._name}({", ".join(args)})'
+            return f'{self._scope.qualified_name}::{self._name}({", ".join(args)})'
+
+    @property
+    def key(self) -> str:
+        """
+        Identity of the function: its USR, the same in every translation unit
+        and for every declaration, or else its signature without the return
+        type.
+        """
+        if self._key is None:
+            self._key = self._usr or self.signature(with_return_type=False)
+        return self._key
 
     def __eq__(self, obj):
         if isinstance(obj, Function):
-            return self.signature(with_return_type=False) == obj.signature(
-                with_return_type=False
-            )
+            return self.key == obj.key
         else:
             return False
+
+    def __hash__(self):
+        return hash(self.key)
@@ -0,0 +1,37 @@
+import os
+
+from cppygen._clang.cindex import Cursor
+
+
+class LocationFilter:
+    """
+    Predicate for Cursor.find_children telling which cursors not to export:
+    those located in a system header when `skip_system_headers` is set, and
+    those outside `directories` when it is given.
+    """
+
+    def __init__(
+        self, skip_system_headers: bool = True, directories: list[str] | None = None
+    ):
+        self._skip_system_headers = skip_system_headers
+        self._directories = None
+        if directories is not None:
+            self._directories = tuple(
+                [os.path.join(os.path.realpath(i), "") for i in directories]
+            )
+        self._files: dict[str, bool] = {}
+
+    def _is_outside(self, filename: str) -> bool:
+        if (outside := self._files.get(filename)) is None:
+            outside = not os.path.realpath(filename).startswith(self._directories)
+            self._files[filename] = outside
+        return outside
+
+    def __call__(self, cursor: Cursor) -> bool:
+        location = cursor.location
+        if self._skip_system_headers and location.is_in_system_header:
+            return True
+        if self._directories is None:
+            return False
+        # Builtin declarations have no file.
+        return location.file is None or self._is_outside(location.file.name)
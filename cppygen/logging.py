@@ -29,11 +29,24 @@ def _color_supported() -> bool:
         return True
 
 
+class _StdoutHandler(colorlog.StreamHandler):
+    """Handler writing to the current sys.stdout, which the server redirects."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
 def get_logger(name: str) -> Logger:
-    handler = colorlog.StreamHandler(sys.stdout)
-    handler.setFormatter(create_default_formatter())
     logger = colorlog.getLogger(name)
-    logger.addHandler(handler)
+    if not any(isinstance(i, _StdoutHandler) for i in logger.handlers):
+        handler = _StdoutHandler()
+        handler.setFormatter(create_default_formatter())
+        logger.addHandler(handler)
     return logger
 
 
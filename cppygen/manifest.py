@@ -0,0 +1,66 @@
+import os
+import pathlib
+import pickle
+from typing import Any
+
+from .ast_cache import FileDigests
+from .output import replacing
+
+
+class Manifest:
+    """
+    Extraction results of every translation unit parsed by the last run.
+
+    Each entry stores the model extracted from one translation unit together
+    with the content hash of every file it pulled in. An entry is reused while
+    its key (source, flags, settings) and all of those hashes are unchanged.
+    """
+
+    def __init__(
+        self, filename: str | pathlib.Path, digests: FileDigests | None = None
+    ):
+        self._filename = pathlib.Path(filename)
+        self._entries: dict[str, tuple[str, dict[str, str | None], bytes]] = {}
+        self._used: set[str] = set()
+        self._digests = digests if digests is not None else FileDigests()
+        try:
+            with open(self._filename, "rb") as f:
+                self._entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    def _digest(self, filename: str) -> str | None:
+        return self._digests.get(filename)
+
+    def lookup(self, filename: str, key: str) -> tuple[Any, list[str]] | None:
+        """
+        Return (model, dependencies) recorded for `filename`, or None if it has
+        to be parsed again.
+        """
+        name = os.path.abspath(filename)
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != key:
+            return None
+        for dependency, digest in entry[1].items():
+            if self._digest(dependency) != digest:
+                return None
+        self._used.add(name)
+        return pickle.loads(entry[2]), list(entry[1])
+
+    def record(self, filename: str, key: str, model: Any, dependencies: list[str]):
+        name = os.path.abspath(filename)
+        self._entries[name] = (
+            key,
+            {i: self._digest(i) for i in dependencies},
+            pickle.dumps(model),
+        )
+        self._used.add(name)
+
+    def save(self):
+        """
+        Write the entries looked up or recorded by this run.
+        """
+        entries = {k: v for k, v in self._entries.items() if k in self._used}
+        self._filename.parent.mkdir(parents=True, exist_ok=True)
+        with replacing(self._filename) as tmp:
+            tmp.write_bytes(pickle.dumps(entries))
@@ -0,0 +1,70 @@
+import contextlib
+import hashlib
+import os
+import pathlib
+import threading
+from typing import Iterator
+
+
+def _escape(path: str) -> str:
+    return (
+        path.replace("\\", "\\\\")
+        .replace(" ", "\\ ")
+        .replace("#", "\\#")
+        .replace("$", "$$")
+    )
+
+
+@contextlib.contextmanager
+def replacing(filename: str | pathlib.Path) -> Iterator[pathlib.Path]:
+    """
+    Yield a temporary path to write instead of `filename`, which it replaces
+    atomically once the block completes. Readers, other processes or threads
+    included, see either the old or the new file, never a partial one. The
+    temporary file is removed if the block raises.
+    """
+    tmp = pathlib.Path(f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        yield tmp
+        os.replace(tmp, filename)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def write_if_changed(filename: str | pathlib.Path, content: str) -> bool:
+    """
+    Write `content` to `filename` unless the file already holds it, so that
+    the mtime of unchanged outputs is preserved. The file is replaced
+    atomically, an interrupted run never leaves it truncated.
+
+    Return True if the file was written.
+    """
+    data = content.encode()
+    try:
+        with open(filename, "rb") as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    except OSError:
+        pass
+    with replacing(filename) as tmp:
+        tmp.write_bytes(data)
+    return True
+
+
+def write_depfile(
+    filename: str | pathlib.Path,
+    targets: list[str | pathlib.Path],
+    dependencies: list[str | pathlib.Path],
+):
+    """
+    Write a Makefile/Ninja style depfile declaring that `targets` depend on
+    every existing file in `dependencies`.
+    """
+    deps = [os.path.realpath(i) for i in dependencies if os.path.isfile(i)]
+    write_if_changed(
+        filename,
+        " ".join([_escape(os.path.abspath(i)) for i in targets])
+        + ":"
+        + "".join([f" \\\n  {_escape(i)}" for i in dict.fromkeys(deps)])
+        + "\n",
+    )
@@ -0,0 +1,266 @@
+import collections
+import multiprocessing
+import pathlib
+from concurrent.futures import (
+    FIRST_EXCEPTION,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from cppygen._clang.cindex import Config
+
+from .cppygen_parser import ParseError, Parser
+
+# Files a worker has started parsing, used to find the culprit when libclang
+# kills a worker process.
+_started: Any = None
+
+
+def _parser_settings(parser: Parser) -> dict[str, Any]:
+    return {
+        "namespace": parser._namespace,
+        "verbose": parser._verbose,
+        "call_guards": list(parser._call_guards),
+        "library_file": Config.library_file,
+        "library_path": Config.library_path,
+        "cache_dir": parser._cache_dir,
+        "parse_options": parser._parse_options,
+        "precompiled_headers": parser._precompiled_headers,
+        "pch_dir": str(parser._pch.directory) if parser._pch else None,
+        "skip_system_headers": parser._skip_system_headers,
+        "directories": parser._directories,
+    }
+
+
+def _flags_of(
+    filename: str | pathlib.Path,
+    flags: list[str],
+    file_flags: dict[str, list[str]] | None,
+) -> list[str]:
+    if file_flags is not None and (args := file_flags.get(str(filename))) is not None:
+        return args
+    return flags
+
+
+def _init_worker(started):
+    global _started
+    _started = started
+
+
+def _parse_worker(settings: dict[str, Any], filename: str, lang: str, flags: list):
+    _started.put(filename)
+    parser = Parser(
+        settings["namespace"],
+        library_file=settings["library_file"],
+        library_path=None if settings["library_file"] else settings["library_path"],
+        verbose=settings["verbose"],
+        cache_dir=settings["cache_dir"],
+        parse_options=settings["parse_options"],
+        precompiled_headers=settings["precompiled_headers"],
+        pch_dir=settings["pch_dir"],
+        skip_system_headers=settings["skip_system_headers"],
+        directories=settings["directories"],
+    )
+    for call_guard in settings["call_guards"]:
+        parser.add_call_guard(call_guard)
+    parser.parse_from_file(filename, lang=lang, flags=flags)
+    return parser.get_model(), parser.get_dependencies()
+
+
+def _lookup_manifest(
+    parser: Parser,
+    files: list[tuple[str | pathlib.Path, str]],
+    flags: list[str],
+    file_flags: dict[str, list[str]] | None,
+) -> tuple[dict[int, tuple], dict[int, str]]:
+    """
+    Return the results reused from the manifest of `parser` and the manifest
+    keys of the files which have to be parsed, both by position in `files`.
+    """
+    results = {}
+    keys = {}
+    if parser._manifest is None:
+        return results, keys
+    for n, (filename, lang) in enumerate(files):
+        with open(filename, "r") as f:
+            data = f.read()
+        key = parser._manifest_key(
+            data, str(filename), lang, _flags_of(filename, flags, file_flags), "source"
+        )
+        if (entry := parser._manifest.lookup(str(filename), key)) is not None:
+            results[n] = entry
+        else:
+            keys[n] = key
+    return results, keys
+
+
+def _merge_results(
+    parser: Parser,
+    files: list[tuple[str | pathlib.Path, str]],
+    flags: list[str],
+    file_flags: dict[str, list[str]] | None,
+    results: dict[int, tuple],
+    keys: dict[int, str],
+):
+    for n, (filename, lang) in enumerate(files):
+        if parser._manifest is not None and n in keys:
+            parser._manifest.record(str(filename), keys[n], *results[n])
+        args = _flags_of(filename, flags, file_flags)
+        parser._parse_args[str(filename)] = (lang, list(args), True, "source")
+        parser.merge_model(*results[n], str(filename))
+
+
+def parse_files_in_processes(
+    parser: Parser,
+    files: list[tuple[str | pathlib.Path, str]],
+    flags: list[str],
+    jobs: int,
+    file_flags: dict[str, list[str]] | None = None,
+):
+    """
+    Parse `files` ([(filename, lang),]) in `jobs` worker processes and merge the
+    extracted entities into `parser` in the order of `files`. A file found in
+    `file_flags` is parsed with those flags instead of `flags`.
+
+    A fatal diagnostic or a crash of libclang in one worker raises ParseError
+    for the offending file as soon as it is known: queued files are cancelled
+    and the workers still parsing are killed rather than waited for.
+    """
+    settings = _parser_settings(parser)
+    context = multiprocessing.get_context()
+    started = context.SimpleQueue()
+    results, keys = _lookup_manifest(parser, files, flags, file_flags)
+    if parser._pch is not None and len(results) < len(files):
+        # Build the precompiled header once per set of flags, the workers load it.
+        vectors = {
+            tuple(_flags_of(filename, flags, file_flags)): None
+            for n, (filename, _) in enumerate(files)
+            if n not in results
+        }
+        for args in vectors:
+            parser._pch.get(
+                parser.index, parser._get_args(list(args)), parser._get_options()
+            )
+    executor = ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(started,),
+    )
+    try:
+        futures = {
+            executor.submit(
+                _parse_worker,
+                settings,
+                str(filename),
+                lang,
+                _flags_of(filename, flags, file_flags),
+            ): n
+            for n, (filename, lang) in enumerate(files)
+            if n not in results
+        }
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        for future in done:
+            if future.exception() is None:
+                results[futures[future]] = future.result()
+        failed = [i for i in done if i.exception() is not None]
+        if failed:
+            errors = [i.exception() for i in failed]
+            error = next((i for i in errors if isinstance(i, ParseError)), errors[0])
+            if isinstance(error, ParseError):
+                raise error
+            if isinstance(error, BrokenProcessPool):
+                raise _crash_error(started, {str(files[n][0]) for n in results})
+            raise error
+    except BaseException:
+        _terminate(executor)
+        raise
+    executor.shutdown()
+
+    _merge_results(parser, files, flags, file_flags, results, keys)
+
+
+def _terminate(executor: ProcessPoolExecutor):
+    """
+    Shut `executor` down without waiting for the parses in flight: pending
+    ones are cancelled and the worker processes are killed.
+    """
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _crash_error(started, finished: set[str]) -> ParseError:
+    in_flight = []
+    while not started.empty():
+        filename = started.get()
+        if filename not in finished and filename not in in_flight:
+            in_flight.append(filename)
+    if len(in_flight) == 1:
+        return ParseError(in_flight[0], [f"{in_flight[0]}: libclang crashed"])
+    return ParseError(
+        ", ".join(in_flight), [f"libclang crashed while parsing one of {in_flight}"]
+    )
+
+
+def parse_files_in_threads(
+    parser: Parser,
+    files: list[tuple[str | pathlib.Path, str]],
+    flags: list[str],
+    jobs: int,
+    file_flags: dict[str, list[str]] | None = None,
+):
+    """
+    Parse `files` ([(filename, lang),]) with `jobs` threads sharing the
+    libclang Index of `parser`. A file found in `file_flags` is parsed with
+    those flags instead of `flags`.
+
+    Only the libclang parse runs on the pool (ctypes releases the GIL around
+    it), with at most `jobs` files submitted ahead of the one being extracted.
+    Entities are extracted on the calling thread in the order of `files`.
+    """
+    results, keys = _lookup_manifest(parser, files, flags, file_flags)
+    # Create the shared Index up front rather than racing for it in workers.
+    parser.index
+
+    def get_tu(child: Parser, filename: str, lang: str):
+        with open(filename, "r") as f:
+            data = f.read()
+        return child._get_tu(
+            data, filename, _flags_of(filename, flags, file_flags), lang
+        )
+
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    pending = iter([n for n in range(len(files)) if n not in results])
+    # Parses in flight, in the order of `files`. Only about `jobs` translation
+    # units are alive at once, each is dropped once extracted.
+    window: collections.deque[tuple[int, Parser, Future]] = collections.deque()
+
+    def submit():
+        if (n := next(pending, None)) is not None:
+            child = parser._child()
+            future = executor.submit(get_tu, child, str(files[n][0]), files[n][1])
+            window.append((n, child, future))
+
+    try:
+        for _ in range(jobs):
+            submit()
+        while window:
+            n, child, future = window.popleft()
+            tu = future.result()
+            del future
+            submit()
+            child.parse_tu(tu, str(files[n][0]), files[n][1], with_diagnostic=True)
+            del tu
+            results[n] = (child.get_model(), child.get_dependencies())
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+    _merge_results(parser, files, flags, file_flags, results, keys)
@@ -0,0 +1,104 @@
+import json
+import os
+import pathlib
+import tempfile
+import threading
+
+from cppygen._clang.cindex import (
+    Index,
+    TranslationUnit,
+    TranslationUnitSaveError,
+    conf,
+)
+
+from .digest import fingerprint
+from .logging import get_logger
+from .output import replacing
+
+logger = get_logger("pch")
+
+
+class PchCache:
+    """
+    Precompiled headers of `headers`, built once per distinct set of flags and
+    parse options and passed to every translation unit with -include-pch.
+
+    A PCH is kept in `directory` together with the modification times of the
+    files it read, and rebuilt when one of them changes. Without a directory
+    a temporary one is used for the lifetime of the process.
+    """
+
+    def __init__(self, headers: list[str], directory: str | None = None):
+        self._headers = headers
+        if directory is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix="cppygen-pch-")
+            directory = self._tmp.name
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._built: dict[str, tuple[str, list[str]] | None] = {}
+
+    def get(
+        self, index: Index, args: list[str], options: int
+    ) -> tuple[str, list[str]] | None:
+        """
+        Return (path of the PCH, files it read) for `args`, building it if
+        needed, or None if the headers can not be precompiled with `args`.
+        """
+        options |= TranslationUnit.PARSE_INCOMPLETE
+        key = fingerprint(conf.get_clang_version(), options, self._headers, args)
+        with self._lock:
+            if key not in self._built:
+                self._built[key] = self._load(key) or self._build(
+                    index, key, args, options
+                )
+            return self._built[key]
+
+    def _load(self, key: str) -> tuple[str, list[str]] | None:
+        pch = self.directory / f"{key}.pch"
+        try:
+            with open(self.directory / f"{key}.json", "r") as f:
+                mtimes: dict[str, int] = json.load(f)
+            for filename, mtime in mtimes.items():
+                if os.stat(filename).st_mtime_ns != mtime:
+                    return None
+        except (OSError, ValueError):
+            return None
+        if not pch.exists():
+            return None
+        header = str(self.directory / f"{key}.hpp")
+        return str(pch), [i for i in mtimes if i != header]
+
+    def _build(
+        self, index: Index, key: str, args: list[str], options: int
+    ) -> tuple[str, list[str]] | None:
+        header = self.directory / f"{key}.hpp"
+        header.write_text("".join([f"#include <{i}>\n" for i in self._headers]))
+        tu = TranslationUnit.from_source(
+            str(header),
+            [*args, "-x", "c++-header"],
+            options=options,
+            index=index,
+        )
+        errors = [i for i in tu.diagnostics if i.severity in [i.Error, i.Fatal]]
+        if errors:
+            logger.warning(
+                f"precompiled_headers can not be precompiled: {errors[0].spelling}"
+            )
+            return None
+
+        dependencies = [i.include.name for i in tu.get_includes()]
+        pch = self.directory / f"{key}.pch"
+        try:
+            with replacing(pch) as tmp:
+                tu.save(tmp)
+        except TranslationUnitSaveError:
+            return None
+
+        mtimes = {
+            i: os.stat(i).st_mtime_ns
+            for i in dict.fromkeys([str(header), *dependencies])
+        }
+        with replacing(self.directory / f"{key}.json") as tmp:
+            tmp.write_text(json.dumps(mtimes))
+        return str(pch), list(dict.fromkeys(dependencies))
@@ -0,0 +1,193 @@
+import contextlib
+import mmap
+import os
+import re
+
+_INCLUDE = re.compile(
+    rb'^[ \t]*#[ \t]*(?:include|include_next|import)[ \t]*[<"]([^>"\r\n]+)[>"]',
+    re.MULTILINE,
+)
+_DEFINE = re.compile(
+    rb"^[ \t]*#[ \t]*define[ \t]+(\w+)((?:\\\r?\n|[^\n])*)", re.MULTILINE
+)
+# An include naming a macro may include anything.
+_COMPUTED_INCLUDE = re.compile(rb"^[ \t]*#[ \t]*include[ \t]+[A-Za-z_]", re.MULTILINE)
+_DEFINE_FLAG = re.compile(r"-D\s*(\w+)(?:=(.*))?")
+_INCLUDE_OPTIONS = ["-I", "-isystem", "-iquote", "-idirafter"]
+# Files included before the first line of every source.
+_FORCED_INCLUDE_OPTIONS = ["-include", "-imacros"]
+
+
+def _option_values(flags: list[str], options: list[str]) -> list[str]:
+    """
+    Values of `options` in `flags`, given as a separate argument or joined.
+    """
+    values = []
+    it = iter(flags)
+    for flag in it:
+        if flag in options:
+            values.append(next(it, ""))
+        elif option := next((i for i in options if flag.startswith(i)), None):
+            values.append(flag[len(option) :])
+    return [i for i in values if i]
+
+
+def _include_directories(flags: list[str]) -> list[str]:
+    return _option_values(flags, _INCLUDE_OPTIONS)
+
+
+@contextlib.contextmanager
+def _read(filename: str):
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses empty files.
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+class _File:
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.mentions = False
+        self.includes: list[str] = []
+        self.defines: list[tuple[bytes, bytes]] = []
+
+
+class Prescan:
+    """
+    Byte-level scan telling which files may contribute exports, without
+    libclang. A file may export if it or a file it includes, directly or not,
+    opens the namespace `namespace`, uses a macro whose definition mentions it
+    or includes a file named by a macro. Includes are resolved against the
+    including directory and the include directories of `flags`, and followed
+    whatever the preprocessor conditions.
+    Includes that can not be resolved are assumed not to open `namespace`.
+
+    The files forced into every source by -include or -imacros in `flags`, and
+    the `includes` resolved against the include directories (e.g.
+    precompiled_headers), are scanned as if every file included them.
+    """
+
+    def __init__(self, namespace: str, flags: list[str] = [], includes: list[str] = []):
+        self._name = re.escape(namespace.encode())
+        self._namespace = re.compile(rb"\bnamespace\s+" + self._name + rb"\b")
+        self._directories = _include_directories(flags)
+        self._files: dict[str, _File] = {}
+        # Macros given on the command line.
+        self._defines: list[tuple[bytes, bytes]] = []
+        for flag in _option_values(flags, ["-D"]):
+            if (match := _DEFINE_FLAG.fullmatch(f"-D{flag}")) is not None:
+                self._defines.append((match[1].encode(), (match[2] or "").encode()))
+        forced = [
+            *[
+                self._resolve(i, os.getcwd())
+                for i in _option_values(flags, _FORCED_INCLUDE_OPTIONS)
+            ],
+            *[self._resolve(i) for i in includes],
+        ]
+        self._forced = [i for i in forced if i is not None]
+
+    @property
+    def files(self) -> list[str]:
+        """
+        Every file read by the scan.
+        """
+        return list(self._files)
+
+    def _resolve(self, include: str, directory: str | None = None) -> str | None:
+        for i in [*filter(None, [directory]), *self._directories]:
+            if os.path.isfile(path := os.path.join(i, include)):
+                return os.path.normpath(os.path.abspath(path))
+        return None
+
+    def _scan(self, filename: str):
+        pending = [filename]
+        while pending:
+            name = pending.pop()
+            if name in self._files:
+                continue
+            file = self._files[name] = _File(name)
+            try:
+                with _read(name) as data:
+                    file.mentions = (
+                        self._namespace.search(data) is not None
+                        or _COMPUTED_INCLUDE.search(data) is not None
+                    )
+                    file.defines = [(i[1], i[2]) for i in _DEFINE.finditer(data)]
+                    includes = [i[1].decode() for i in _INCLUDE.finditer(data)]
+            except OSError:
+                continue
+            directory = os.path.dirname(name)
+            for include in includes:
+                if (path := self._resolve(include, directory)) is not None:
+                    file.includes.append(path)
+                    pending.append(path)
+
+    def _macros(self) -> re.Pattern | None:
+        """
+        Pattern matching the macros which expand to something mentioning the
+        namespace, through other macros or not.
+        """
+        defines = [
+            *self._defines,
+            *[j for i in self._files.values() for j in i.defines],
+        ]
+        names: set[bytes] = set()
+        while True:
+            words = [self._name, *[re.escape(i) for i in sorted(names)]]
+            pattern = re.compile(rb"\b(?:" + b"|".join(words) + rb")\b")
+            found = {
+                i for i, body in defines if i not in names and pattern.search(body)
+            }
+            if not found:
+                break
+            names |= found
+        if not names:
+            return None
+        words = [re.escape(i) for i in sorted(names)]
+        return re.compile(rb"\b(?:" + b"|".join(words) + rb")\b")
+
+    def filter(self, filenames: list) -> list:
+        """
+        Return the `filenames` which may contribute exports, in order.
+        """
+        names = [os.path.normpath(os.path.abspath(i)) for i in filenames]
+        for name in [*self._forced, *names]:
+            self._scan(name)
+
+        if (macros := self._macros()) is not None:
+            for file in self._files.values():
+                if file.mentions:
+                    continue
+                try:
+                    with _read(file.filename) as data:
+                        file.mentions = macros.search(data) is not None
+                except OSError:
+                    pass
+
+        # Propagate mentions to the files including them.
+        reaches = {name: file.mentions for name, file in self._files.items()}
+        changed = True
+        while changed:
+            changed = False
+            for name, file in self._files.items():
+                if not reaches[name] and any(reaches[i] for i in file.includes):
+                    reaches[name] = changed = True
+        # Every file includes the forced ones, which mostly define macros:
+        # their definitions alone do not open the namespace.
+        for name in self._forced:
+            try:
+                with _read(name) as data:
+                    code = _DEFINE.sub(b"", data)
+            except OSError:
+                continue
+            if (
+                self._namespace.search(code) is not None
+                or _COMPUTED_INCLUDE.search(code) is not None
+                or (macros is not None and macros.search(code) is not None)
+                or any(reaches[i] for i in self._files[name].includes)
+            ):
+                return list(filenames)
+        return [i for i, name in zip(filenames, names) if reaches[name]]
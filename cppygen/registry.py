@@ -0,0 +1,59 @@
+from typing import Generic, Hashable, Iterable, Iterator, Protocol, TypeVar
+
+
+class _Keyed(Protocol):
+    @property
+    def key(self) -> Hashable: ...
+
+
+T = TypeVar("T", bound=_Keyed)
+
+
+class Registry(Generic[T]):
+    """
+    Entities (Function, Submodule, CppClass) in insertion order, indexed by
+    their `key`, so that membership tests and deduplicated insertion take
+    constant time instead of a scan comparing every entry.
+    """
+
+    def __init__(self, items: Iterable[T] = ()):
+        self._items: list[T] = []
+        # Number of entries for each key.
+        self._keys: dict[Hashable, int] = {}
+        for i in items:
+            self.append(i)
+
+    def append(self, item: T):
+        """
+        Add `item` even if an equal entity is already registered.
+        """
+        self._items.append(item)
+        self._keys[item.key] = self._keys.get(item.key, 0) + 1
+
+    def add(self, item: T) -> bool:
+        """
+        Add `item` unless an equal entity is already registered. Return True
+        if it was added.
+        """
+        if item.key in self._keys:
+            return False
+        self.append(item)
+        return True
+
+    def has_key(self, key: Hashable) -> bool:
+        return key in self._keys
+
+    def __contains__(self, item: object) -> bool:
+        return getattr(item, "key", None) in self._keys
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index: int) -> T:
+        return self._items[index]
+
+    def __repr__(self) -> str:
+        return f"Registry({self._items!r})"
@@ -0,0 +1,66 @@
+class Scope:
+    """
+    Namespace or class scope, a node of the tree rooted at the global scope.
+
+    Scopes are interned and immutable: `child` returns the same node for the
+    same name, so every model declared in a scope shares it and its qualified
+    ("a::b") and sanitized ("a_b") names are joined once.
+    """
+
+    __slots__ = (
+        "name",
+        "parent",
+        "names",
+        "qualified_name",
+        "sanitized_name",
+        "_children",
+    )
+
+    _root: "Scope | None" = None
+
+    def __init__(self, name: str = "", parent: "Scope | None" = None):
+        names = (*parent.names, name) if parent is not None else ()
+        init = super().__setattr__
+        init("name", name)
+        init("parent", parent)
+        init("names", names)
+        init("qualified_name", "::".join(names))
+        init("sanitized_name", "_".join(names))
+        init("_children", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Scope is immutable, can not set {name}")
+
+    @classmethod
+    def root(cls) -> "Scope":
+        """
+        The global scope.
+        """
+        if cls._root is None:
+            cls._root = cls()
+        return cls._root
+
+    @classmethod
+    def of(cls, names: "Scope | list[str] | tuple[str, ...]") -> "Scope":
+        """
+        The scope named by the sequence of names `names`.
+        """
+        if isinstance(names, Scope):
+            return names
+        scope = cls.root()
+        for i in names:
+            scope = scope.child(i)
+        return scope
+
+    def child(self, name: str) -> "Scope":
+        if (scope := self._children.get(name)) is None:
+            scope = self._children[name] = Scope(name, self)
+        return scope
+
+    def __reduce__(self):
+        # Unpickled scopes, in the manifest or from worker processes, are
+        # interned again.
+        return (Scope.of, (self.names,))
+
+    def __repr__(self) -> str:
+        return f"Scope({self.qualified_name!r})"
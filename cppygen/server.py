@@ -0,0 +1,149 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import tempfile
+import traceback
+
+# Environment variables read while generating, forwarded by the client.
+ENVIRONMENT = ["CPPYGEN_COMPILE_FLAGS", "CPPYGEN_LIBCLANG_PATH", "NO_COLOR"]
+
+
+def default_socket() -> str:
+    directory = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(directory, f"cppygen-{os.getuid()}.sock")
+
+
+def _is_listening(socket_path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def request(socket_path: str, argv: list[str], cwd: str) -> tuple[int, str] | None:
+    """
+    Run `cppygen <argv>` in the server listening on `socket_path` as if it was
+    started in `cwd`. Return (exit status, output), or None if no server is
+    running.
+    """
+    message = {
+        "argv": argv,
+        "cwd": cwd,
+        "env": {i: os.environ.get(i) for i in ENVIRONMENT},
+    }
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+            s.sendall(json.dumps(message).encode() + b"\n")
+            with s.makefile("rb") as f:
+                response = json.loads(f.readline())
+    except (FileNotFoundError, ConnectionRefusedError, ValueError):
+        return None
+    return response["status"], response["output"]
+
+
+@contextlib.contextmanager
+def _environment(cwd: str, env: dict[str, str | None]):
+    saved_cwd = os.getcwd()
+    saved_env = {i: os.environ.get(i) for i in env}
+    try:
+        os.chdir(cwd)
+        for k, v in env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        for k, v in saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "Server"
+
+    def handle(self):
+        from .__main__ import _argument_parser, generate
+
+        line = self.rfile.readline()
+        if not line:
+            return
+        message = json.loads(line)
+        output = io.StringIO()
+        status = 0
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            try:
+                with _environment(message["cwd"], message["env"]):
+                    generate(
+                        _argument_parser().parse_args(message["argv"]),
+                        self.server.tu_cache,
+                    )
+            except SystemExit as e:
+                status = e.code if isinstance(e.code, int) else 1
+            except Exception:
+                traceback.print_exc()
+                status = 1
+        response = {"status": status, "output": output.getvalue()}
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    Generation server keeping libclang loaded and the translation units of
+    previous requests alive (see TuCache). Requests are served one at a time.
+    """
+
+    def __init__(self, socket_path: str):
+        from .tu_cache import TuCache
+
+        self.tu_cache = TuCache()
+        if os.path.exists(socket_path):
+            if _is_listening(socket_path):
+                raise OSError(
+                    f"a cppygen server is already listening on {socket_path}"
+                )
+            # Left behind by a server which did not shut down cleanly.
+            os.unlink(socket_path)
+        # Only the owner may connect.
+        umask = os.umask(0o077)
+        try:
+            super().__init__(socket_path, _Handler)
+        finally:
+            os.umask(umask)
+
+    def server_close(self):
+        super().server_close()
+        with contextlib.suppress(OSError):
+            os.unlink(self.server_address)  # type: ignore
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(
+        prog="cppygen serve",
+        description="Serve `cppygen --client` requests, keeping libclang and the "
+        "translation units of previous requests in memory.",
+    )
+    parser.add_argument(
+        "--socket", type=str, help=f"socket to listen on (default {default_socket()})"
+    )
+    args = parser.parse_args(argv)
+
+    # Shut down cleanly, removing the socket, on SIGTERM as on Ctrl-C.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    with Server(args.socket or default_socket()) as server:
+        print(f"cppygen: serving on {server.server_address}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
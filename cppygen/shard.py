@@ -0,0 +1,104 @@
+from typing import Literal
+
+from .cppclass import CppClass
+from .function import Function
+
+Entity = Function | CppClass
+
+
+def binding_count(entity: Entity) -> int:
+    """
+    Estimated number of pybind11 statements emitted for `entity`.
+    """
+    if isinstance(entity, CppClass):
+        return 1 + len(entity._members) + len(entity._member_funcs)
+    return 1
+
+
+def split(
+    entities: list[Entity],
+    count: int,
+    by: Literal["balanced"] | Literal["submodule"] = "balanced",
+) -> list[list[Entity]]:
+    """
+    Split `entities` (in emission order) into `count` shards.
+
+    "balanced" cuts the emission order into contiguous runs of roughly equal
+    binding count. "submodule" keeps the entities of a submodule together and
+    distributes the submodules over the shards.
+
+    Each shard keeps the emission order, and the shards are ordered so that
+    base classes are registered before the classes deriving from them. Shards
+    may be empty.
+    """
+    if by == "balanced":
+        shards = _split_balanced(entities, count)
+    elif by == "submodule":
+        shards = _split_by_module(entities, count)
+    else:
+        raise KeyError('shard_by should be "balanced" or "submodule"')
+    return _order(shards, entities, count)
+
+
+def _split_balanced(entities: list[Entity], count: int) -> list[list[Entity]]:
+    total = sum([binding_count(i) for i in entities])
+    shards: list[list[Entity]] = [[] for _ in range(count)]
+    done = 0
+    for i in entities:
+        # Place each entity by the midpoint of its bindings.
+        middle = 2 * done + binding_count(i)
+        shards[min(middle * count // max(2 * total, 1), count - 1)].append(i)
+        done += binding_count(i)
+    return shards
+
+
+def _split_by_module(entities: list[Entity], count: int) -> list[list[Entity]]:
+    modules: dict[str | None, list[Entity]] = {}
+    for i in entities:
+        modules.setdefault(i._module, []).append(i)
+    shards: list[list[Entity]] = [[] for _ in range(count)]
+    weights = [0] * count
+    for group in sorted(
+        modules.values(), key=lambda x: -sum([binding_count(i) for i in x])
+    ):
+        lightest = weights.index(min(weights))
+        shards[lightest].extend(group)
+        weights[lightest] += sum([binding_count(i) for i in group])
+    return shards
+
+
+def _order(
+    shards: list[list[Entity]], entities: list[Entity], count: int
+) -> list[list[Entity]]:
+    position = {id(i): n for n, i in enumerate(entities)}
+    shard_of = {}
+    for n, shard in enumerate(shards):
+        shard.sort(key=lambda x: position[id(x)])
+        for i in shard:
+            if isinstance(i, CppClass):
+                shard_of[i._full_name] = n
+
+    depends = [set() for _ in shards]
+    for n, shard in enumerate(shards):
+        for i in shard:
+            if isinstance(i, CppClass):
+                for base in i._base_names:
+                    m = shard_of.get(base)
+                    if m is not None and m != n:
+                        depends[n].add(m)
+
+    ordered: list[list[Entity]] = []
+    remaining = list(range(len(shards)))
+    while remaining:
+        ready = [n for n in remaining if not depends[n] & set(remaining)]
+        if not ready:
+            # Shards depending on each other are merged into one.
+            merged = sorted(
+                [i for n in remaining for i in shards[n]],
+                key=lambda x: position[id(x)],
+            )
+            ordered.append(merged)
+            break
+        ordered.extend([shards[n] for n in ready])
+        remaining = [n for n in remaining if n not in ready]
+    return ordered + [[] for _ in range(count - len(ordered))]
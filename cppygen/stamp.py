@@ -0,0 +1,68 @@
+import json
+import os
+import pathlib
+
+from .digest import file_stat
+from .output import write_if_changed
+
+
+def is_up_to_date(filename: str | pathlib.Path, key: str) -> bool:
+    """
+    True if the stamp `filename` was written for `key`, every output it lists
+    exists and none of its dependencies changed since.
+    """
+    try:
+        with open(filename, "r") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if stamp.get("key") != key:
+        return False
+    for i in stamp["outputs"]:
+        if not os.path.exists(i):
+            return False
+    for i, st in stamp["dependencies"].items():
+        if st is None or file_stat(i) != tuple(st):
+            return False
+    return True
+
+
+def dependencies(filename: str | pathlib.Path) -> list[str]:
+    """
+    Files recorded by the stamp `filename`, or [] if there is none.
+    """
+    try:
+        with open(filename, "r") as f:
+            return list(json.load(f)["dependencies"])
+    except (OSError, ValueError, KeyError):
+        return []
+
+
+def write_stamp(
+    filename: str | pathlib.Path,
+    key: str,
+    outputs: list[str | pathlib.Path],
+    dependencies: list[str | pathlib.Path],
+    started: int,
+):
+    """
+    Record a successful run started at `started` (time.time_ns()) together
+    with the modification time and size of every existing file in
+    `dependencies`.
+    """
+    deps = {}
+    for i in dict.fromkeys([os.path.abspath(i) for i in dependencies]):
+        if (st := file_stat(i)) is not None:
+            # The outputs may not reflect a file modified during the run.
+            deps[i] = st if st[0] < started else None
+    write_if_changed(
+        filename,
+        json.dumps(
+            {
+                "key": key,
+                "outputs": [os.path.abspath(i) for i in outputs],
+                "dependencies": deps,
+            },
+            indent=1,
+        ),
+    )
@@ -1,38 +1,45 @@
 from typing import Dict, List, Tuple, TypedDict
 
+from .scope import Scope
+
 
 class Submodule:
     """
     Represent Submodule.
     """
 
+    # Cached by key, reset by the setters it depends on.
+    _key: str | None = None
+
     def __init__(self):
         self._name: str | None = None
         self._description = ""
-        self._parents: List[str] = []
+        self._parent = Scope.root()
 
     @property
     def cpp_name(self) -> str:
         if self._name == None:
             print("Parse Error Skipping ...")
             return ""
-        return "_".join(self._parents) + "_" + self._name
+        return f"{self._parent.sanitized_name}_{self._name}"
 
     @property
     def cpp_parent_name(self) -> str:
         if self._name == None:
             print("Parse Error Skipping ...")
             return ""
-        return "_".join(self._parents)
+        return self._parent.sanitized_name
 
     def set_name(self, name: str):
         self._name = name
+        self._key = None
 
     def set_description(self, description: str):
         self._description = description
 
-    def set_parent(self, parents: List[str]):
-        self._parents = parents
+    def set_parent(self, parents: Scope | List[str]):
+        self._parent = Scope.of(parents)
+        self._key = None
 
     def to_pybind_string(self):
         if self._name == None:
@@ -40,8 +47,20 @@ class Submodule:
             return ""
         return f'auto {self.cpp_name} = {self.cpp_parent_name}.def_submodule("{self._name}", "{self._description}");'
 
+    @property
+    def key(self) -> str:
+        """
+        Identity of the submodule, its cpp_name.
+        """
+        if self._key is None:
+            self._key = self.cpp_name
+        return self._key
+
     def __eq__(self, obj):
         if isinstance(obj, Submodule):
-            return self.cpp_name == obj.cpp_name
+            return self.key == obj.key
         else:
             return False
+
+    def __hash__(self):
+        return hash(self.key)
@@ -0,0 +1,82 @@
+import os
+import threading
+from typing import NamedTuple
+
+from cppygen._clang.cindex import Index, TranslationUnit, TranslationUnitLoadError
+
+
+class _Entry(NamedTuple):
+    args: list[str]
+    options: int
+    source: str
+    mtimes: dict[str, int | None]
+    tu: TranslationUnit
+
+
+def _mtime(filename: str) -> int | None:
+    try:
+        return os.stat(filename).st_mtime_ns
+    except OSError:
+        return None
+
+
+class TuCache:
+    """
+    Translation units kept alive between runs of a long-running process (see
+    cppygen.server), the last one parsed for each file.
+
+    An entry is returned as is while the source, the compile arguments and
+    every file it included are unchanged. When only contents changed it is
+    reparsed, which reuses the precompiled preamble of the translation unit.
+    """
+
+    def __init__(self):
+        self._index: Index | None = None
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+
+    @property
+    def index(self) -> Index:
+        with self._lock:
+            if self._index is None:
+                self._index = Index.create()
+            return self._index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self, source: str, filename: str, args: list[str], options: int
+    ) -> TranslationUnit:
+        name = os.path.abspath(filename)
+        options |= TranslationUnit.PARSE_PRECOMPILED_PREAMBLE
+        with self._lock:
+            entry = self._entries.pop(name, None)
+
+        tu = None
+        if entry is not None and entry.args == args and entry.options == options:
+            if entry.source == source and all(
+                _mtime(k) == v for k, v in entry.mtimes.items()
+            ):
+                tu = entry.tu
+            else:
+                try:
+                    entry.tu.reparse([(filename, source)])
+                    tu = entry.tu
+                except TranslationUnitLoadError:
+                    pass
+        if tu is None:
+            tu = TranslationUnit.from_source(
+                filename,
+                args,
+                unsaved_files=[(filename, source)],
+                options=options,
+                index=self.index,
+            )
+
+        mtimes = {i.include.name: None for i in tu.get_includes()}
+        with self._lock:
+            self._entries[name] = _Entry(
+                args, options, source, {i: _mtime(i) for i in mtimes}, tu
+            )
+        return tu
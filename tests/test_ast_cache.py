@@ -0,0 +1,68 @@
+from cppygen import ast_cache
+from cppygen.ast_cache import AstCache
+from cppygen.cppygen_parser import Parser
+
+
+def _write_sources(tmp_path, name):
+    (tmp_path / "inc.hpp").write_text(f"namespace cppygen {{ void {name}(); }}\n")
+    (tmp_path / "main.hpp").write_text(
+        '#include "inc.hpp"\nnamespace cppygen { void f(); }\n'
+    )
+
+
+def _parse(tmp_path):
+    p = Parser(cache_dir=str(tmp_path / "cache"))
+    p.parse_from_file(str(tmp_path / "main.hpp"), lang="hpp", mode="header")
+    return p
+
+
+def test_ast_cache(tmp_path):
+    _write_sources(tmp_path, "g")
+    first = _parse(tmp_path)
+    assert len(list((tmp_path / "cache").glob("*.ast"))) == 1
+
+    second = _parse(tmp_path)
+    assert second.cpp_generate() == first.cpp_generate()
+    assert len(list((tmp_path / "cache").glob("*.ast"))) == 1
+
+    # An included header changed, the cached AST is stale.
+    _write_sources(tmp_path, "h")
+    third = _parse(tmp_path)
+    assert "cppygen::h" in third.cpp_generate()
+    assert "cppygen::g" not in third.cpp_generate()
+
+
+def test_ast_cache_prunes_stale_entries(tmp_path):
+    _write_sources(tmp_path, "g")
+    _parse(tmp_path)
+    # A new version of the source replaces the entry of the old one.
+    (tmp_path / "main.hpp").write_text(
+        '#include "inc.hpp"\nnamespace cppygen { void f2(); }\n'
+    )
+    assert "cppygen::f2" in _parse(tmp_path).cpp_generate()
+    assert len(list((tmp_path / "cache").glob("*.ast"))) == 1
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 1
+
+
+def test_ast_cache_size_limit(tmp_path):
+    p = Parser()
+    cache = AstCache(tmp_path / "cache", max_size=0)
+    for name in ["a", "b"]:
+        source = f"namespace cppygen {{ void {name}(); }}\n"
+        filename = str(tmp_path / f"{name}.hpp")
+        tu = p._get_tu(source, filename, lang="hpp")
+        cache.store(tu, cache.key(source, filename, []))
+    # Only the entry just stored is kept over the limit.
+    assert [i.name.split(".")[0] for i in (tmp_path / "cache").glob("*.ast")] == [
+        cache.key("", str(tmp_path / "b.hpp"), []).split(".")[0]
+    ]
+
+
+def test_ast_cache_reuses_digests(tmp_path, monkeypatch):
+    _write_sources(tmp_path, "g")
+    _parse(tmp_path)
+    hashed = []
+    monkeypatch.setattr(ast_cache, "file_digest", lambda i: hashed.append(i))
+    _parse(tmp_path)
+    # Unchanged includes are recognized by their modification time and size.
+    assert hashed == []
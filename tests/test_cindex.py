@@ -0,0 +1,114 @@
+import gc
+import threading
+import time
+import types
+
+from cppygen._clang.cindex import Cursor, CursorKind, LazyLibrary, conf
+from cppygen.cppygen_parser import Parser
+
+
+def test_find_children():
+    tu = Parser()._get_tu(
+        "namespace a { struct S { int x; void f(int y); }; int g(int z); }",
+        "tmp.hpp",
+        lang="hpp",
+    )
+    kinds = [CursorKind.NAMESPACE, CursorKind.STRUCT_DECL, CursorKind.PARM_DECL]
+
+    def walk(cursor, depth):
+        for i in cursor.get_children():
+            if i.kind in kinds:
+                yield i.kind, i.spelling
+            if depth > 1:
+                yield from walk(i, depth - 1)
+
+    for max_depth in [1, 2, 4]:
+        found = tu.cursor.find_children(kinds, max_depth)
+        assert [(i.kind, i.spelling) for i in found] == list(
+            walk(tu.cursor, max_depth)
+        )
+    assert [i.spelling for i in tu.cursor.find_children(kinds, None)] == [
+        "a",
+        "S",
+        "y",
+        "z",
+    ]
+
+
+class CountingLib:
+    def __init__(self, lib):
+        self._lib = lib
+        self.calls = 0
+
+    def __getattr__(self, name):
+        self.calls += 1
+        return getattr(self._lib, name)
+
+
+def test_cached_properties(monkeypatch, capsys):
+    source = "namespace cppygen {\n" + "".join(
+        [
+            f"/// f{i}\nint f{i}(int a, double b);\n"
+            f"/// C{i}\nstruct C{i} {{ int x; int g(int y) const; }};\n"
+            for i in range(20)
+        ]
+    ) + "}\n"
+    tu = Parser()._get_tu(source, "tmp.hpp", lang="hpp")
+    lib = CountingLib(conf.lib)
+    monkeypatch.setattr(conf, "lib", lib)
+
+    def read(cursor: Cursor):
+        return [
+            cursor.kind,
+            cursor.spelling,
+            cursor.type.spelling,
+            cursor.result_type.spelling,
+            cursor.access_specifier,
+            cursor.raw_comment,
+            cursor.brief_comment,
+        ]
+
+    for i in tu.cursor.find_children([CursorKind.FUNCTION_DECL], None):
+        first = read(i)
+        calls = lib.calls
+        assert read(i) == first
+        assert lib.calls == calls
+
+    # The verbose log reads the same properties again, without FFI calls.
+    calls = []
+    for verbose in [False, True]:
+        # Objects left by earlier tests call libclang when they are collected.
+        gc.collect()
+        lib.calls = 0
+        Parser(verbose=verbose).parse_tu(tu, "tmp.hpp", "hpp", mode="header")
+        calls.append(lib.calls)
+    assert calls[0] == calls[1]
+    capsys.readouterr()
+
+
+def test_lazy_library_threads():
+    class Library:
+        # Like ctypes.CDLL, creates the function on the first lookup.
+        def __getattr__(self, name):
+            time.sleep(0.01)
+            func = types.SimpleNamespace()
+            setattr(self, name, func)
+            return func
+
+    lib = LazyLibrary(Library(), False)
+    barrier = threading.Barrier(8)
+    found = []
+
+    def lookup():
+        barrier.wait()
+        func = lib.clang_parseTranslationUnit
+        found.append((func, getattr(func, "restype", None)))
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for i in threads:
+        i.start()
+    for i in threads:
+        i.join()
+    # Every thread calls the one function whose prototype was registered.
+    assert len({id(func) for func, _ in found}) == 1
+    assert all(restype is not None for _, restype in found)
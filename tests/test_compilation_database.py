@@ -0,0 +1,86 @@
+import json
+
+from cppygen.compilation_database import _filter_arguments, compile_flags
+from cppygen.cppygen_parser import Parser
+from cppygen.parallel import parse_files_in_threads
+
+
+def test_compile_flags(tmp_path):
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc/name.hpp").write_text("#define NAME f\n")
+    source = '#include "name.hpp"\nnamespace cppygen { int NAME() { return 0; } }\n'
+    for i in ["a", "b", "d"]:
+        (tmp_path / f"{i}.cpp").write_text(source)
+    (tmp_path / "c.cpp").write_text(source.split("\n", 1)[1])
+    command = (
+        "c++ -Iinc -O2 -g -fsanitize=address -DX -c {0}.cpp -o {0}.o -MD -MF {0}.d"
+    )
+    commands = [
+        {"directory": str(tmp_path), "file": f"{i}.cpp", "command": command.format(i)}
+        for i in ["a", "b"]
+    ]
+    commands.append(
+        {
+            "directory": str(tmp_path),
+            "file": "c.cpp",
+            "arguments": ["c++", "-DNAME=g", "-c", "c.cpp"],
+        }
+    )
+    (tmp_path / "compile_commands.json").write_text(json.dumps(commands))
+    files = [str(tmp_path / f"{i}.cpp") for i in ["a", "b", "c", "d"]]
+
+    p = Parser()
+    flags = compile_flags(tmp_path, files, ["-DCPPYGEN"])
+    assert flags[files[0]] == ["-DCPPYGEN", f"-I{tmp_path / 'inc'}", "-DX"]
+    assert flags[files[0]] is flags[files[1]]
+    assert flags[files[2]] == ["-DCPPYGEN", "-DNAME=g"]
+    # Inferred from a neighbour by libclang.
+    assert flags[files[3]] == flags[files[0]]
+
+    parse_files_in_threads(p, [(i, "cpp") for i in files], [], 2, flags)
+    assert [i._name for i in p._functions] == ["f", "g"]
+
+
+def test_filter_arguments():
+    def filtered(*arguments: str) -> list[str]:
+        return _filter_arguments(["c++", *arguments, "a.cpp"], "a.cpp", "/build")
+
+    # Options taking a separate value keep it, or drop it with them.
+    assert filtered("-gcc-toolchain", "/opt/gcc") == ["-gcc-toolchain", "/opt/gcc"]
+    assert filtered("-target", "x86_64-linux-gnu", "-o", "a.o") == [
+        "-target",
+        "x86_64-linux-gnu",
+    ]
+    assert filtered("-MF", "a.d", "-D", "X") == ["-D", "X"]
+    # Only debug flags are dropped among the -g options.
+    for arg in ["-g", "-g0", "-g3", "-ggdb", "-ggdb3", "-gdwarf", "-gdwarf-4"]:
+        assert filtered(arg, "-DX") == ["-DX"]
+    assert filtered("-gline-tables-only", "-gcc-toolchain=/opt/gcc") == [
+        "-gcc-toolchain=/opt/gcc"
+    ]
+    # Relative paths are made absolute, separate or joined.
+    assert filtered("-imacros", "m.h", "-imacrosn.h") == [
+        "-imacros",
+        "/build/m.h",
+        "-imacros/build/n.h",
+    ]
+    assert filtered("-include-pch", "pch/a.pch", "-include", "p.h") == [
+        "-include-pch",
+        "/build/pch/a.pch",
+        "-include",
+        "/build/p.h",
+    ]
+    assert filtered("-Xclang", "-include-pch", "-Xclang", "a.pch") == [
+        "-Xclang",
+        "-include-pch",
+        "-Xclang",
+        "/build/a.pch",
+    ]
+    assert filtered("-Xclang", "-include", "-Xclang", "p.h", "-Xclang", "-ast") == [
+        "-Xclang",
+        "-include",
+        "-Xclang",
+        "/build/p.h",
+        "-Xclang",
+        "-ast",
+    ]
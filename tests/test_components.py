@@ -1,6 +1,12 @@
+import pickle
+
+import pytest
+
 from cppygen.function import Function
 from cppygen.submodule import Submodule
 from cppygen.cppclass import CppClass
+from cppygen.registry import Registry
+from cppygen.scope import Scope
 
 
 def test_function():
@@ -86,6 +92,58 @@ def test_submod_compare():
     assert submod1 == submod2
     assert submod1 != submod3
     assert submod2 != submod3
+    assert len({submod1, submod2, submod3}) == 2
+
+    # The cached key follows the setters.
+    submod3.set_name("foo")
+    assert submod1 == submod3 and hash(submod1) == hash(submod3)
+
+
+def test_scope():
+    scope = Scope.root().child("psub1").child("psub2")
+    assert scope is Scope.of(["psub1", "psub2"])
+    assert scope.parent is Scope.of(["psub1"])
+    assert scope.qualified_name == "psub1::psub2"
+    assert scope.sanitized_name == "psub1_psub2"
+    assert pickle.loads(pickle.dumps(scope)) is scope
+
+    with pytest.raises(AttributeError):
+        scope.name = "other"
+
+    # Models declared in the same scope share it.
+    fun1, fun2, submodule = Function(), Function(), Submodule()
+    fun1.set_name("f", ["psub1", "psub2"])
+    fun2.set_name("g", scope)
+    submodule.set_parent(["psub1", "psub2"])
+    assert fun1._scope is fun2._scope is submodule._parent is scope
+
+
+def test_registry():
+    def function(name: str, types: list[str], return_type="void") -> Function:
+        fun = Function()
+        fun.set_name(name, ["ns"])
+        fun.set_argument_types([(f"a{n}", i) for n, i in enumerate(types)])
+        fun.set_return_type(return_type)
+        return fun
+
+    registry = Registry()
+    assert registry.add(function("f", ["int"]))
+    assert registry.add(function("g", []))
+    assert registry.add(function("f", ["double"]))
+    # Same signature, the return type does not matter.
+    assert not registry.add(function("f", ["int"], "int"))
+    assert [i.signature(False) for i in registry] == [
+        "ns::f(int)",
+        "ns::g()",
+        "ns::f(double)",
+    ]
+
+    fun = function("h", [])
+    assert fun not in registry
+    fun.add_argument_type(("a0", "int"))
+    registry.append(fun)
+    registry.append(function("h", ["int"]))
+    assert function("h", ["int"]) in registry and len(registry) == 5
 
 
 def test_struct_or_class():
@@ -1,6 +1,9 @@
 import pytest
 
+from cppygen.cppclass import CppClass
 from cppygen.cppygen_parser import Parser
+from cppygen.function import Function
+from cppygen.registry import Registry
 
 
 def test_cppygen_valueerror():
@@ -41,3 +44,293 @@ def test_cppygen_header_mode():
 
     with open("./tests/expect_out/impl2", "r") as f:
         assert f.read() == f"{p.cpp_generate()}\n"
+
+
+def test_cppygen_declaration_order():
+    # As before namespace children were classified in a single traversal:
+    # the entities of a namespace come before those of its submodules, even
+    # when declared after them.
+    source = (
+        "namespace cppygen {\n"
+        "namespace a { int g() { return 0; } struct B {}; }\n"
+        "int f() { return 0; }\n"
+        "struct C {};\n"
+        "namespace b { int h() { return 0; } }\n"
+        "}\n"
+    )
+    p = Parser()
+    p.parse(source, "order.hpp", lang="hpp", mode="header")
+    assert p.to_decl_string().splitlines()[1:-2] == [
+        "namespace cppygen { int f(); }",
+        "namespace cppygen::a { int g(); }",
+        "namespace cppygen::b { int h(); }",
+    ]
+    assert [i._full_name for i in p._export_classes] == ["cppygen::C", "cppygen::a::B"]
+    assert [i.cpp_name for i in p._submodules] == ["cppygen_a", "cppygen_b"]
+
+
+def test_cppygen_verbose_submodule(capsys):
+    # A reopened namespace is registered, and reported, once.
+    source = "namespace cppygen {\nnamespace a {}\nnamespace a {}\n}\n"
+    p = Parser(verbose=True)
+    p.parse(source, "reopen.hpp", lang="hpp", mode="header")
+    assert capsys.readouterr().out.count("| Submodule   | cppygen_a") == 1
+    assert [i.cpp_name for i in p._submodules] == ["cppygen_a"]
+
+
+def test_cppygen_register_functions():
+    p = Parser()
+    for name, namespace in [("a_b", ["ns"]), ("b", ["ns", "a"])]:
+        cpp_class = CppClass()
+        cpp_class.set_name(name, namespace)
+        cpp_class.set_module("ns")
+        p._add_cpp_class(cpp_class)
+
+    out = p.cpp_generate()
+    assert "static void register_ns_a_b(pybind11::module_ &ns)\n{\n" in out
+    assert "static void register_ns_a_b_2(pybind11::module_ &ns)\n{\n" in out
+    assert "\tregister_ns_a_b(ns);\n\tregister_ns_a_b_2(ns);\n" in out
+
+
+def test_cppygen_register_functions_chunks(monkeypatch):
+    source = (
+        "namespace cppygen {\n"
+        + "".join(f"int f{i}() {{ return {i}; }}\n" for i in range(450))
+        + "}\n"
+    )
+    p = Parser()
+    p.parse(source, "many.hpp", lang="hpp", mode="header")
+
+    rendered = []
+    to_pybind_string = Function.to_pybind_string
+
+    def count(self, *args, **kwargs):
+        rendered.append(self)
+        return to_pybind_string(self, *args, **kwargs)
+
+    monkeypatch.setattr(Function, "to_pybind_string", count)
+    out = p.cpp_generate()
+    assert len(rendered) == 450
+    names = [
+        "register_functions_cppygen",
+        "register_functions_cppygen_2",
+        "register_functions_cppygen_3",
+    ]
+    for name in names:
+        assert f"static void {name}(pybind11::module_ &cppygen)\n{{\n" in out
+    assert "register_functions_cppygen_4" not in out
+    assert "".join(f"\t{name}(cppygen);\n" for name in names) in out
+    assert out.count(".def(") == 450
+
+
+def test_cppygen_parse_options():
+    outputs = []
+    for parse_options in ["none", "fast"]:
+        p = Parser(parse_options=parse_options)
+        p.parse_from_file("./tests/sources/test.cpp", lang="cpp")
+        p.parse_from_file("./tests/sources/test.hpp", lang="hpp")
+        outputs.append(p.cpp_generate())
+
+    assert "&cppygen::g" in outputs[1]
+    assert outputs[0] == outputs[1]
+
+    assert Parser(parse_options=["Skip_Function_Bodies"])._get_options() == 64
+    with pytest.raises(ValueError, match='"skip_function_body"'):
+        Parser(parse_options=["skip_function_body"])
+    with pytest.raises(ValueError, match='"faster"'):
+        Parser(parse_options="faster")
+
+
+def test_cppygen_parse_options_in_memory():
+    # The source only exists in memory, definitions are told apart from the
+    # buffer libclang parsed.
+    source = (
+        "namespace cppygen {\n"
+        "int f() { return 0; }\n"
+        "int g();\n"
+        "int h() try { return 0; } catch (...) { return 1; }\n"
+        "}\n"
+    )
+    for parse_options in ["none", "fast", ["skip_function_bodies"]]:
+        p = Parser(parse_options=parse_options)
+        p.parse(source, "/nonexistent/in_memory.cpp", lang="cpp")
+        assert [i._name for i in p._functions] == ["f", "h"]
+
+    # Definitions expanded from a macro.
+    source = (
+        "#define DEF(n) int n() { return 0; }\n"
+        "namespace cppygen {\n"
+        "DEF(f) DEF(g)\n"
+        "}\n"
+    )
+    for parse_options in ["none", "fast"]:
+        p = Parser(parse_options=parse_options)
+        p.parse(source, "/nonexistent/in_memory.cpp", lang="cpp")
+        assert [i._name for i in p._functions] == ["f", "g"]
+
+
+def test_cppygen_update_file(tmp_path):
+    a, b = str(tmp_path / "a.cpp"), str(tmp_path / "b.cpp")
+    (tmp_path / "a.cpp").write_text("namespace cppygen { int f() { return 0; } }\n")
+    (tmp_path / "b.cpp").write_text("namespace cppygen { int g() { return 0; } }\n")
+    p = Parser()
+    p.parse_from_file(a)
+    p.parse_from_file(b)
+
+    (tmp_path / "a.cpp").write_text("namespace cppygen { int h() { return 0; } }\n")
+    p.update_file(a)
+    expected = Parser()
+    expected.parse_from_file(a)
+    expected.parse_from_file(b)
+    assert [i._name for i in p._functions] == ["h", "g"]
+    assert p.cpp_generate() == expected.cpp_generate()
+
+    p.update_file(b, "namespace cppygen { int k() { return 0; } }\n")
+    assert [i._name for i in p._functions] == ["h", "k"]
+    # The translation unit kept by the first update is reparsed.
+    tu = p._tu_cache._entries[b].tu
+    p.update_file(b, "namespace cppygen { int l() { return 0; } }\n")
+    assert p._tu_cache._entries[b].tu is tu
+    with pytest.raises(KeyError):
+        p.update_file(str(tmp_path / "c.cpp"))
+
+
+def test_cppygen_update_file_dependencies(tmp_path):
+    a, x = str(tmp_path / "a.cpp"), str(tmp_path / "x.hpp")
+    (tmp_path / "x.hpp").write_text("")
+    (tmp_path / "a.cpp").write_text('#include "x.hpp"\n')
+    p = Parser()
+    p.parse_from_file(a)
+    assert x in p.get_dependencies()
+
+    p.update_file(a, "namespace cppygen { int f() { return 0; } }\n")
+    assert p.get_dependencies() == [a]
+
+
+def test_cppygen_location_filter(tmp_path):
+    for name in ["own", "vendor", "system"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f"{name}.hpp").write_text(
+            f"namespace cppygen {{ int {name}(); }}\n"
+        )
+    source = "#include <own.hpp>\n#include <vendor.hpp>\n#include <system.hpp>\n"
+    flags = [f"-I{tmp_path / 'own'}", f"-I{tmp_path / 'vendor'}"]
+    flags += ["-isystem", str(tmp_path / "system")]
+
+    def functions(**kwargs) -> list[str]:
+        p = Parser(**kwargs)
+        p.parse(source, str(tmp_path / "tmp.hpp"), "hpp", flags, mode="header")
+        return [i._name for i in p._functions]
+
+    assert functions(skip_system_headers=False) == ["own", "vendor", "system"]
+    assert functions() == ["own", "vendor"]
+    assert functions(directories=[str(tmp_path / "own")]) == ["own"]
+
+
+def test_cppygen_template_bases(tmp_path):
+    source = """
+        namespace cppygen {
+        template <class T> struct Base { T x; };
+        template <class T> struct BaseX { T y; };
+        namespace sub { template <class T> struct Base { T z; }; }
+        template <class T> struct Box {};
+        using Long = Base<long>;
+        struct A : ::cppygen::Base<int> {};
+        struct C : Long {};
+        template <class T> struct D : Base<T> {};
+        // Visited after sub, whose template is then known.
+        namespace use {
+        struct B : Base<Box<int>>, sub::Base<int>, BaseX<double> {};
+        }
+        }
+    """
+    p = Parser()
+    p.parse(source, str(tmp_path / "a.hpp"), "hpp", mode="header")
+    assert [i._full_name for i in p._export_classes] == [
+        "cppygen::Base<int>",
+        "cppygen::A",
+        "cppygen::Base<long>",
+        "cppygen::C",
+        "cppygen::Base<Box<int> >",
+        "cppygen::sub::Base<int>",
+        "cppygen::BaseX<double>",
+        "cppygen::use::B",
+    ]
+    assert [i["name"] for i in p._export_classes[6]._members] == ["y"]
+
+
+def test_cppygen_template_bases_scaling(monkeypatch):
+    p = Parser()
+    for n in range(20):
+        template = CppClass(is_template=True)
+        template.set_name(f"Base{n}", ["ns"])
+        template.add_member("x", "int")
+        p._add_cpp_class(template)
+    classes = []
+    for n in range(2000):
+        cpp_class = CppClass()
+        cpp_class.set_name(f"C{n}", ["ns"])
+        name = f"Base{n % 20}<{['int', 'long', 'double'][n % 3]}>"
+        cpp_class.add_base_class(f"::ns::{name}", (f"ns::Base{n % 20}", name))
+        classes.append(cpp_class)
+
+    # The templates and the instantiations already exported are looked up
+    # by key: adding a class neither scans the registered classes nor
+    # compares it with them, which made adding them quadratic.
+    def scan(*args):
+        raise AssertionError("registered classes scanned")
+
+    monkeypatch.setattr(Registry, "__iter__", scan)
+    monkeypatch.setattr(Registry, "__getitem__", scan)
+    monkeypatch.setattr(CppClass, "__eq__", scan)
+    instantiations = []
+    instantiate = CppClass.instantiate
+
+    def count(self, name):
+        instantiations.append(name)
+        return instantiate(self, name)
+
+    monkeypatch.setattr(CppClass, "instantiate", count)
+    for cpp_class in classes:
+        p._add_cpp_class(cpp_class)
+    assert len(instantiations) == 2000
+    assert len(p._export_classes) == 2000 + 60
+
+
+def test_cppygen_usr_identity(tmp_path):
+    p = Parser()
+    p.parse(
+        "namespace cppygen { using Int = int; int f(Int); int f(int); int f(); }",
+        str(tmp_path / "a.hpp"),
+        "hpp",
+        mode="header",
+    )
+    assert [i.signature(False) for i in p._functions] == [
+        "cppygen::f(Int)",
+        "cppygen::f()",
+    ]
+
+    # Spelled differently in two translation units.
+    p = Parser()
+    for name, source in [
+        ("a.cpp", "namespace cppygen { inline int g(int) { return 0; } }"),
+        ("b.cpp", "namespace cppygen { using I = int; inline int g(I) { return 0; } }"),
+    ]:
+        (tmp_path / name).write_text(source)
+        p.parse_from_file(str(tmp_path / name))
+    assert [i.signature(False) for i in p._functions] == ["cppygen::g(int)"]
+
+
+def test_cppygen_class_usr_identity(tmp_path):
+    # A class defined in a header included by two translation units.
+    (tmp_path / "common.hpp").write_text(
+        "namespace cppygen { struct S; struct S { int x; }; }\n"
+    )
+    p = Parser()
+    for name in ["a.hpp", "b.hpp"]:
+        (tmp_path / name).write_text('#include "common.hpp"\n')
+        p.parse_from_file(str(tmp_path / name), lang="hpp")
+    assert [(i._full_name, len(i._members)) for i in p._cpp_classes] == [
+        ("cppygen::S", 1)
+    ]
+    assert p.cpp_generate().count("pybind11::class_<::cppygen::S>") == 1
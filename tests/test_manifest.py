@@ -0,0 +1,36 @@
+from cppygen.cppygen_parser import Parser
+
+
+def _write_sources(tmp_path, name):
+    (tmp_path / "inc.hpp").write_text(f"namespace cppygen {{ void {name}(); }}\n")
+    (tmp_path / "main.cpp").write_text(
+        '#include "inc.hpp"\nnamespace cppygen { void f() {} }\n'
+    )
+
+
+def _parse(tmp_path, monkeypatch, expect_parse):
+    p = Parser(manifest_file=str(tmp_path / "manifest.pickle"))
+    parsed = []
+    get_tu = p._get_tu
+    monkeypatch.setattr(
+        Parser, "_get_tu", lambda self, *args: parsed.append(args) or get_tu(*args)
+    )
+    p.parse_from_file(str(tmp_path / "main.cpp"), lang="cpp")
+    p.save_manifest()
+    monkeypatch.undo()
+    assert bool(parsed) == expect_parse
+    return p
+
+
+def test_manifest(tmp_path, monkeypatch):
+    _write_sources(tmp_path, "g")
+    first = _parse(tmp_path, monkeypatch, True)
+    assert str(tmp_path / "inc.hpp") in first.get_dependencies()
+
+    second = _parse(tmp_path, monkeypatch, False)
+    assert second.cpp_generate() == first.cpp_generate()
+    assert second.get_dependencies() == first.get_dependencies()
+
+    # Only an included header changed.
+    _write_sources(tmp_path, "h")
+    _parse(tmp_path, monkeypatch, True)
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from cppygen.output import replacing, write_depfile, write_if_changed
+
+
+def test_write_depfile(tmp_path):
+    (tmp_path / "a b.hpp").write_text("")
+    (tmp_path / "c.hpp").write_text("")
+    write_depfile(
+        tmp_path / "out.d",
+        [tmp_path / "out.cpp"],
+        [tmp_path / "a b.hpp", tmp_path / "c.hpp", "tmp.hpp", tmp_path / "c.hpp"],
+    )
+    assert (tmp_path / "out.d").read_text() == (
+        f"{tmp_path}/out.cpp: \\\n"
+        f"  {tmp_path}/a\\ b.hpp \\\n"
+        f"  {tmp_path}/c.hpp\n"
+    )
+
+
+def test_write_if_changed(tmp_path):
+    out = tmp_path / "out.cpp"
+    assert write_if_changed(out, "foo")
+    os.utime(out, ns=(0, 0))
+
+    assert not write_if_changed(out, "foo")
+    assert out.stat().st_mtime_ns == 0
+
+    assert write_if_changed(out, "bar")
+    assert out.read_text() == "bar"
+    assert list(tmp_path.iterdir()) == [out]
+
+
+def test_replacing(tmp_path):
+    out = tmp_path / "out.json"
+    out.write_text("old")
+    with pytest.raises(ValueError):
+        with replacing(out) as tmp:
+            tmp.write_text("partial")
+            raise ValueError
+    assert out.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [out]
+
+    with replacing(out) as tmp:
+        tmp.write_text("new")
+    assert out.read_text() == "new"
+    assert list(tmp_path.iterdir()) == [out]
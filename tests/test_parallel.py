@@ -0,0 +1,100 @@
+import multiprocessing
+import os
+import time
+import weakref
+
+import pytest
+
+from cppygen.cppygen_parser import ParseError, Parser
+from cppygen.parallel import parse_files_in_processes, parse_files_in_threads
+
+FILES = [("./tests/sources/test.cpp", "cpp"), ("./tests/sources/test.hpp", "hpp")]
+
+
+def test_parse_files_in_processes():
+    serial = Parser()
+    for filename, lang in FILES:
+        serial.parse_from_file(filename, lang=lang)
+
+    parallel = Parser()
+    parse_files_in_processes(parallel, FILES, [], 2)
+
+    assert parallel.cpp_generate() == serial.cpp_generate()
+    assert parallel.hpp_generate() == serial.hpp_generate()
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="the patched parse reaches the workers by fork only",
+)
+def test_parse_files_in_processes_stops_early(tmp_path, monkeypatch):
+    (tmp_path / "bad.cpp").write_text("namespace cppygen { int f( }\n")
+    (tmp_path / "slow.cpp").write_text("namespace cppygen { int g(); }\n")
+    parse_from_file = Parser.parse_from_file
+
+    def slow_parse_from_file(self, filename, *args, **kwargs):
+        if filename.endswith("slow.cpp"):
+            (tmp_path / "slow.pid").write_text(str(os.getpid()))
+            time.sleep(60)
+        # Fail once the slow parse is in flight.
+        for _ in range(1000):
+            if (tmp_path / "slow.pid").exists():
+                break
+            time.sleep(0.01)
+        return parse_from_file(self, filename, *args, **kwargs)
+
+    # Inherited by the workers, which are forked whatever the default start
+    # method of the platform.
+    monkeypatch.setattr(Parser, "parse_from_file", slow_parse_from_file)
+    context = multiprocessing.get_context("fork")
+    monkeypatch.setattr(multiprocessing, "get_context", lambda *args: context)
+    files = [(str(tmp_path / "slow.cpp"), "cpp"), (str(tmp_path / "bad.cpp"), "cpp")]
+    with pytest.raises(ParseError) as e:
+        parse_files_in_processes(Parser(), files, [], 2)
+    assert e.value.filename == str(tmp_path / "bad.cpp")
+    # The worker still parsing was killed rather than left running.
+    with pytest.raises(ProcessLookupError):
+        os.kill(int((tmp_path / "slow.pid").read_text()), 0)
+
+
+def test_parse_files_in_threads():
+    serial = Parser()
+    for filename, lang in FILES:
+        serial.parse_from_file(filename, lang=lang)
+
+    threaded = Parser()
+    parse_files_in_threads(threaded, FILES, [], 2)
+
+    assert threaded.cpp_generate() == serial.cpp_generate()
+    assert threaded.hpp_generate() == serial.hpp_generate()
+
+
+def test_parse_files_in_threads_window(tmp_path, monkeypatch):
+    files = []
+    for n in range(8):
+        (tmp_path / f"{n}.cpp").write_text(
+            f"namespace cppygen {{ int f{n}() {{ return 0; }} }}\n"
+        )
+        files.append((str(tmp_path / f"{n}.cpp"), "cpp"))
+
+    # Translation units alive whenever one is extracted.
+    alive = weakref.WeakSet()
+    counts = []
+    get_tu, parse_tu = Parser._get_tu, Parser.parse_tu
+
+    def tracked_get_tu(self, *args, **kwargs):
+        tu = get_tu(self, *args, **kwargs)
+        alive.add(tu)
+        return tu
+
+    def tracked_parse_tu(self, *args, **kwargs):
+        counts.append(len(alive))
+        return parse_tu(self, *args, **kwargs)
+
+    monkeypatch.setattr(Parser, "_get_tu", tracked_get_tu)
+    monkeypatch.setattr(Parser, "parse_tu", tracked_parse_tu)
+    p = Parser()
+    parse_files_in_threads(p, files, [], 2)
+
+    assert [i._name for i in p._functions] == [f"f{n}" for n in range(8)]
+    assert len(counts) == 8 and max(counts) <= 3
@@ -0,0 +1,56 @@
+from cppygen.cppygen_parser import Parser
+
+
+def test_precompiled_headers(tmp_path):
+    for i in range(2):
+        (tmp_path / f"f{i}.cpp").write_text(
+            "#include <string>\n"
+            f"namespace cppygen {{ std::string f{i}() {{ return {{}}; }} }}\n"
+        )
+
+    outputs = []
+    for precompiled_headers in [[], ["string"]]:
+        p = Parser(
+            precompiled_headers=precompiled_headers, pch_dir=str(tmp_path / "pch")
+        )
+        for i in range(2):
+            p.parse_from_file(str(tmp_path / f"f{i}.cpp"), lang="cpp")
+        outputs.append(p.cpp_generate())
+        assert any(i.endswith("string") for i in p.get_dependencies())
+
+    assert outputs[0] == outputs[1]
+    assert len(list((tmp_path / "pch").glob("*.pch"))) == 1
+
+
+def test_precompiled_project_header(tmp_path):
+    # A project header declaring exported entities, precompiled and loaded by
+    # every translation unit.
+    (tmp_path / "proj.hpp").write_text(
+        "#pragma once\n"
+        "namespace cppygen {\n"
+        "struct S { int x; };\n"
+        "inline int h() { return 0; }\n"
+        "}\n"
+    )
+    for name in ["a", "b"]:
+        (tmp_path / f"{name}.cpp").write_text(
+            '#include "proj.hpp"\n'
+            f"namespace cppygen {{ int {name}() {{ return 0; }} }}\n"
+        )
+        (tmp_path / f"{name}.hpp").write_text('#include "proj.hpp"\n')
+
+    outputs = []
+    for precompiled_headers in [[], ["proj.hpp"]]:
+        p = Parser(
+            precompiled_headers=precompiled_headers, pch_dir=str(tmp_path / "pch")
+        )
+        for name in ["a", "b"]:
+            for lang in ["cpp", "hpp"]:
+                p.parse_from_file(
+                    str(tmp_path / f"{name}.{lang}"), lang, [f"-I{tmp_path}"]
+                )
+        outputs.append(p.cpp_generate())
+
+    assert outputs[0] == outputs[1]
+    assert outputs[1].count("pybind11::class_<::cppygen::S>") == 1
+    assert outputs[1].count("&cppygen::h,") == 1
@@ -0,0 +1,72 @@
+from cppygen.prescan import Prescan
+
+
+def test_prescan(tmp_path):
+    files = {
+        "direct.hpp": "namespace cppygen { int f(); }\n",
+        "nested.hpp": "namespace cppygen::sub { int f(); }\n",
+        "other.hpp": "namespace other { int f(); }\n// cppygen_generated\n",
+        "empty.hpp": "",
+        "includer.cpp": '#include "inc/indirect.hpp"\n',
+        "inc/indirect.hpp": '#include "../direct.hpp"\n',
+        "system.cpp": "#include <vector>\n#include <other.hpp>\n",
+        "ns.hpp": "#define NS cppygen\n#define BEGIN namespace NS {\n",
+        "macro.hpp": "BEGIN int f(); }\n",
+        "flag.hpp": "namespace FLAG_NS { int f(); }\n",
+        "computed.hpp": "#include HEADER\n",
+        "cycle_a.hpp": '#include "cycle_b.hpp"\n',
+        "cycle_b.hpp": '#include "cycle_a.hpp"\n#include "direct.hpp"\n',
+    }
+    (tmp_path / "inc").mkdir()
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    candidates = [tmp_path / i for i in files if not i.startswith("inc/")]
+
+    prescan = Prescan("cppygen", [f"-I{tmp_path}", "-DFLAG_NS=cppygen"])
+    kept = prescan.filter(candidates)
+    assert [i.name for i in kept] == [
+        "direct.hpp",
+        "nested.hpp",
+        "includer.cpp",
+        "ns.hpp",
+        "macro.hpp",
+        "flag.hpp",
+        "computed.hpp",
+        "cycle_a.hpp",
+        "cycle_b.hpp",
+    ]
+    assert str(tmp_path / "inc/indirect.hpp") in prescan.files
+
+    kept = Prescan("other").filter(candidates)
+    assert [i.name for i in kept] == ["other.hpp", "system.cpp", "computed.hpp"]
+
+
+def test_prescan_command_line_macros(tmp_path):
+    (tmp_path / "a.hpp").write_text("namespace NS { int f(); }\n")
+    (tmp_path / "b.hpp").write_text("BEGIN int f(); }\n")
+    (tmp_path / "other.hpp").write_text("namespace other { int f(); }\n")
+    (tmp_path / "inc").mkdir()
+    (tmp_path / "inc/macros.hpp").write_text("#define BEGIN namespace cppygen {\n")
+    candidates = [tmp_path / "a.hpp", tmp_path / "b.hpp", tmp_path / "other.hpp"]
+
+    # A macro given as two arguments.
+    kept = Prescan("cppygen", ["-D", "NS=cppygen"]).filter(candidates)
+    assert [i.name for i in kept] == ["a.hpp"]
+
+    # Macros of the files included before every source.
+    for flags, includes in [
+        (["-imacros", str(tmp_path / "inc/macros.hpp")], []),
+        ([f"-include{tmp_path / 'inc/macros.hpp'}"], []),
+        ([f"-I{tmp_path / 'inc'}"], ["macros.hpp"]),
+    ]:
+        kept = Prescan("other", flags, includes).filter(candidates)
+        assert [i.name for i in kept] == ["other.hpp"]
+        kept = Prescan("cppygen", flags, includes).filter(candidates)
+        assert [i.name for i in kept] == ["b.hpp"]
+
+    # A forced include opening the namespace is included by every file.
+    (tmp_path / "inc/decls.hpp").write_text("namespace cppygen { int g(); }\n")
+    kept = Prescan("cppygen", ["-include", str(tmp_path / "inc/decls.hpp")]).filter(
+        candidates
+    )
+    assert kept == candidates
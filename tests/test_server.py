@@ -0,0 +1,33 @@
+import os
+import threading
+
+from cppygen.server import Server, request
+
+
+def test_server(tmp_path):
+    (tmp_path / "a.cpp").write_text("namespace cppygen { int f() { return 0; } }\n")
+    (tmp_path / "a.hpp").write_text("namespace cppygen { struct S {}; }\n")
+    (tmp_path / "build").mkdir()
+    (tmp_path / "cppygenconfig.toml").write_text(
+        'sources = ["a.cpp"]\nheaders = ["a.hpp"]\noutput_dir = "build"\n'
+    )
+    socket_path = str(tmp_path / "cppygen.sock")
+    argv = ["--config_file", "cppygenconfig.toml", "--cwd", ".", "--flags=-DX"]
+    argv += ["--include_directories", str(tmp_path)]
+
+    assert request(socket_path, argv, str(tmp_path)) is None
+
+    with Server(socket_path) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        try:
+            assert request(socket_path, argv, str(tmp_path)) == (0, "")
+            assert "&cppygen::f" in (tmp_path / "build/cppygen_generated.cpp").read_text()
+            assert len(server.tu_cache) == 2
+
+            status, output = request(socket_path, ["--config_file", "x.toml"], "/")
+            assert status == 2 and "--cwd" in output
+        finally:
+            server.shutdown()
+            thread.join()
+    assert not os.path.exists(socket_path)
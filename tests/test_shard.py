@@ -0,0 +1,71 @@
+from cppygen.cppclass import CppClass
+from cppygen.cppygen_parser import Parser
+from cppygen.function import Function
+from cppygen.shard import split
+
+
+def _class(name, module, bases=[]):
+    c = CppClass()
+    c.set_name(name, ["ns"])
+    c.set_module(module)
+    for i in bases:
+        c.add_base_class(i)
+    return c
+
+
+def _function(name, module):
+    f = Function()
+    f.set_name(name, ["ns"])
+    f.set_module(module)
+    return f
+
+
+def test_split_balanced():
+    entities = [_function(f"f{i}", "ns") for i in range(6)]
+    shards = split(entities, 3)
+    assert [len(i) for i in shards] == [2, 2, 2]
+    assert sum(shards, []) == entities
+
+    assert sum(split(entities[:1], 3), []) == entities[:1]
+
+
+def test_split_by_module_orders_bases_first():
+    base = _class("Base", "ns_a")
+    derived = _class("Derived", "ns_b", ["ns::Base"])
+    other = _class("Other", "ns_b")
+    shards = split([base, derived, other], 2, "submodule")
+    # ns_b is heavier and would come first, but it derives from ns_a.
+    assert shards == [[base], [derived, other]]
+
+
+def test_split_merges_cyclic_shards():
+    a = _class("A", "ns_a")
+    b = _class("B", "ns_b", ["ns::A"])
+    c = _class("C", "ns_a", ["ns::B"])
+    shards = split([a, b, c], 2, "submodule")
+    assert shards == [[a, b, c], []]
+
+
+def test_split_orders_bases_named_relatively():
+    # Bases spelled as written ("Base", "Tmpl<int>") are matched by the
+    # classes they refer to.
+    source = (
+        "namespace cppygen {\n"
+        "namespace a { struct Base { int x; }; }\n"
+        "namespace t { template <class T> struct Tmpl { T v; }; }\n"
+        "namespace b {\n"
+        "using namespace a;\n"
+        "using namespace t;\n"
+        "struct Derived : Base, Tmpl<int> { int y; int z; };\n"
+        "struct Other { int u; int v; int w; };\n"
+        "}\n"
+        "}\n"
+    )
+    p = Parser()
+    p.parse(source, "bases.hpp", lang="hpp", mode="header")
+    derived = next(i for i in p._export_classes if i._name == "Derived")
+    assert derived._base_names == ["cppygen::a::Base", "cppygen::t::Tmpl<int>"]
+    shards = split(list(p._export_classes), 3, "submodule")
+    order = [i._full_name for shard in shards for i in shard]
+    assert order.index("cppygen::a::Base") < order.index("cppygen::b::Derived")
+    assert order.index("cppygen::t::Tmpl<int>") < order.index("cppygen::b::Derived")
@@ -0,0 +1,37 @@
+import os
+import time
+
+from cppygen.digest import fingerprint
+from cppygen.stamp import is_up_to_date, write_stamp
+
+
+def test_stamp(tmp_path):
+    dependency = tmp_path / "a.hpp"
+    dependency.write_text("")
+    output = tmp_path / "out.cpp"
+    output.write_text("")
+    os.utime(dependency, ns=(0, 0))
+    stamp = tmp_path / "out.stamp"
+    key = fingerprint("0.1", ["a.hpp"], ["-Wall"])
+
+    assert not is_up_to_date(stamp, key)
+    write_stamp(stamp, key, [output], [dependency, "tmp.hpp"], time.time_ns())
+    assert is_up_to_date(stamp, key)
+    assert not is_up_to_date(stamp, fingerprint("0.1", ["a.hpp"], ["-O2"]))
+
+    dependency.write_text("int f();")
+    assert not is_up_to_date(stamp, key)
+
+    write_stamp(stamp, key, [output], [dependency], time.time_ns())
+    output.unlink()
+    assert not is_up_to_date(stamp, key)
+
+
+def test_stamp_modified_during_run(tmp_path):
+    dependency = tmp_path / "a.hpp"
+    started = time.time_ns()
+    dependency.write_text("")
+    os.utime(dependency, ns=(started, started))
+    stamp = tmp_path / "out.stamp"
+    write_stamp(stamp, "key", [], [dependency], started)
+    assert not is_up_to_date(stamp, "key")
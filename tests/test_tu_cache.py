@@ -0,0 +1,34 @@
+import os
+
+from cppygen.cppygen_parser import Parser
+from cppygen.tu_cache import TuCache
+
+
+def test_tu_cache(tmp_path):
+    header = tmp_path / "name.hpp"
+    header.write_text("#define NAME f\n")
+    filename = str(tmp_path / "a.cpp")
+    source = '#include "name.hpp"\nnamespace cppygen { int NAME() { return 0; } }\n'
+    (tmp_path / "a.cpp").write_text(source)
+    cache = TuCache()
+
+    def functions(source: str, flags=[]) -> list[str]:
+        p = Parser(tu_cache=cache)
+        p.parse_tu(p._get_tu(source, filename, flags), filename)
+        return [i._name for i in p._functions]
+
+    assert functions(source) == ["f"]
+    tu = Parser(tu_cache=cache)._get_tu(source, filename)
+    assert Parser(tu_cache=cache)._get_tu(source, filename) is tu
+
+    # A changed source or include is reparsed in place.
+    assert functions(source.replace("{ return 0; }", "{ return 1; }")) == ["f"]
+    header.write_text("#define NAME g\n")
+    os.utime(header, ns=(0, 0))
+    assert functions(source) == ["g"]
+    assert Parser(tu_cache=cache)._get_tu(source, filename) is tu
+
+    # Different flags need a new translation unit.
+    assert functions(source, ["-DNAME=h"]) == ["g"]
+    assert Parser(tu_cache=cache)._get_tu(source, filename, ["-DX"]) is not tu
+    assert len(cache) == 1
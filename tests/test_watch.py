@@ -0,0 +1,30 @@
+import time
+
+from cppygen.__main__ import _argument_parser, watch
+
+
+def test_watch_survives_errors(tmp_path, monkeypatch):
+    (tmp_path / "a.cpp").write_text("namespace cppygen { int f() { return 0; } }\n")
+    (tmp_path / "build").mkdir()
+    config = tmp_path / "cppygenconfig.toml"
+    # Saved half-edited.
+    config.write_text('sources = ["a.cpp"]\noutput_dir = \n')
+    args = _argument_parser().parse_args(
+        ["--config_file", str(config), "--cwd", str(tmp_path), "--flags=-DX"]
+    )
+
+    polls = []
+
+    def sleep(interval):
+        polls.append(interval)
+        if len(polls) == 1:
+            config.write_text(
+                'sources = ["a.cpp"]\nheaders = []\noutput_dir = "build"\n'
+            )
+        else:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(time, "sleep", sleep)
+    watch(args)
+    assert len(polls) == 2
+    assert "&cppygen::f" in (tmp_path / "build/cppygen_generated.cpp").read_text()